@@ -0,0 +1,227 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Set, Tuple
+
+from backend.logs import get_logger
+
+DEFAULT_CAPACITY = 1000  # alerts kept in memory for resuming clients
+REPLAY_COUNT = 50  # alerts a client without a resume point receives on connect
+
+log = get_logger("backend.frames", rate_limited=True)
+
+
+def serialize_alert(alert: dict) -> dict:
+    """JSON-safe view of an alert for websocket clients"""
+    serializable_alert = {
+        'seq': int(alert['seq']),
+        'type': str(alert['type']),
+        'timestamp': float(alert['timestamp']),
+        'message': str(alert['message'])
+    }
+    if 'bbox' in alert:
+        serializable_alert['bbox'] = [int(x) for x in alert['bbox']]
+    if 'confidence' in alert:
+        serializable_alert['confidence'] = float(alert['confidence'])
+    if 'zone_id' in alert:
+        serializable_alert['zone_id'] = str(alert['zone_id'])
+    if 'camera_id' in alert:
+        serializable_alert['camera_id'] = str(alert['camera_id'])
+    if 'track_id' in alert:
+        serializable_alert['track_id'] = int(alert['track_id'])
+    if alert.get('clip_path'):
+        serializable_alert['clip_path'] = str(alert['clip_path'])
+    if 'node' in alert:
+        serializable_alert['node'] = str(alert['node'])
+    return serializable_alert
+
+
+class AlertSubscription:
+    """One client's push queue; fed from any thread through its event loop"""
+
+    QUEUE_SIZE = 256
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, camera_id: Optional[str] = None):
+        self.loop = loop
+        self.camera_id = camera_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.dropped = 0
+
+    def wants(self, alert: dict) -> bool:
+        return self.camera_id is None or alert.get('camera_id') == self.camera_id
+
+    def _offer(self, alert: dict):
+        # A client this far behind loses its oldest alerts; the seq gap tells it so
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(alert)
+
+
+class AlertBus:
+    """In-process pub/sub for alerts.
+
+    Every published alert gets the next sequence number and lands in a
+    bounded ring, then is pushed straight to every matching subscriber.
+    Clients that reconnect pass the last sequence they saw to `since()` and
+    get everything newer that is still in the ring. Sequence numbers start
+    at 1 again when the process restarts; `epoch` tells the runs apart.
+    Safe to publish from worker threads.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self._ring: deque = deque(maxlen=capacity)
+        self._seq = 0
+        self.epoch = f"{time.time_ns():x}"
+        self._lock = threading.Lock()
+        self._subscribers: Set[AlertSubscription] = set()
+
+    def publish(self, alert: dict) -> dict:
+        with self._lock:
+            self._seq += 1
+            alert = {**alert, 'seq': self._seq}
+            self._ring.append(alert)
+            subscribers = [s for s in self._subscribers if s.wants(alert)]
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber._offer, alert)
+        return alert
+
+    def subscribe(self, camera_id: Optional[str] = None) -> AlertSubscription:
+        """Register a push queue on the running event loop"""
+        subscription = AlertSubscription(asyncio.get_running_loop(), camera_id)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: AlertSubscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def since(self, seq: int, camera_id: Optional[str] = None) -> Tuple[List[dict], int]:
+        """Alerts newer than `seq` still in the ring, oldest first, and how many
+        newer alerts had already been evicted"""
+        with self._lock:
+            ring = list(self._ring)
+        missed = max(0, ring[0]['seq'] - seq - 1) if ring else 0
+        # Sequence numbers are contiguous in the ring, so the start is an offset
+        start = max(0, seq - ring[0]['seq'] + 1) if ring else 0
+        return [alert for alert in ring[start:] if camera_id is None or alert.get('camera_id') == camera_id], missed
+
+    def recent(self, count: int = REPLAY_COUNT, camera_id: Optional[str] = None) -> List[dict]:
+        """Newest `count` alerts (optionally for one camera), oldest first"""
+        with self._lock:
+            ring = list(self._ring)
+        if camera_id is not None:
+            ring = [alert for alert in ring if alert.get('camera_id') == camera_id]
+        return ring[-count:] if count else []
+
+    def forget(self, key: str, value) -> int:
+        """Clear `key` on alerts in the ring where it equals `value`, e.g. the path of a
+        clip that was never written; returns how many alerts changed"""
+        changed = 0
+        with self._lock:
+            for alert in self._ring:
+                if alert.get(key) == value:
+                    alert[key] = None
+                    changed += 1
+        return changed
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def latest_seq(self) -> int:
+        return self._seq
+
+    def __len__(self):
+        return len(self._ring)
+
+
+async def wait_closed(websocket):
+    """Return once the client has disconnected, ignoring anything it sends"""
+    while (await websocket.receive())['type'] != 'websocket.disconnect':
+        pass
+
+
+async def stream_alerts(websocket, alert_bus: AlertBus, camera_id: Optional[str] = None, since: Optional[int] = None,
+                        epoch: Optional[str] = None):
+    """Serve one /ws/alerts client from `alert_bus` until the socket fails: a connection
+    status, the backlog after `since` (or the most recent alerts), then every new alert.
+
+    A resume point from another run of the bus (`epoch` differs, or `since` is past its
+    latest seq) would filter out every new alert, so the client instead gets the most
+    recent alerts marked `reset` and should drop its own resume point.
+    Returns when the client disconnects, even while no alerts are coming in, so server
+    shutdown is not held up by idle subscribers."""
+    # Subscribe before reading the backlog so nothing published in between is lost
+    subscription = alert_bus.subscribe(camera_id)
+    closed = asyncio.ensure_future(wait_closed(websocket))
+
+    try:
+        # Send immediate connection confirmation
+        await websocket.send_text(json.dumps({
+            'type': 'connection_status',
+            'status': 'connected',
+            'message': 'Live alerts system connected successfully',
+            'latest_seq': alert_bus.latest_seq,
+            'epoch': alert_bus.epoch
+        }))
+        print("📤 Sent connection confirmation")
+
+        # Send a test alert immediately
+        await websocket.send_text(json.dumps({
+            'type': 'alerts',
+            'data': [{
+                'type': 'system_ready',
+                'timestamp': float(time.time()),
+                'message': '🚀 Alert system is ready and working!'
+            }]
+        }))
+        print("📤 Sent test alert")
+
+        # Backlog: everything after the client's resume point, or the most recent alerts
+        reset = since is not None and (since > alert_bus.latest_seq
+                                       or (epoch is not None and epoch != alert_bus.epoch))
+        if since is not None and not reset:
+            backlog, missed = alert_bus.since(since, camera_id)
+        else:
+            backlog, missed = alert_bus.recent(camera_id=camera_id), 0
+            since = None
+        last_seq = since or 0
+        if backlog or missed or reset:
+            await websocket.send_text(json.dumps({
+                'type': 'alerts',
+                'data': [serialize_alert(alert) for alert in backlog],
+                'missed': missed,
+                **({'reset': True, 'epoch': alert_bus.epoch} if reset else {})
+            }))
+            if backlog:
+                last_seq = backlog[-1]['seq']
+
+        while True:
+            # Wait for the next alert, then take whatever else is already queued
+            next_alert = asyncio.ensure_future(subscription.queue.get())
+            await asyncio.wait({next_alert, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_alert.done():
+                next_alert.cancel()
+                print("❌ Alerts WebSocket client disconnected")
+                return
+            new_alerts = [next_alert.result()]
+            while not subscription.queue.empty():
+                new_alerts.append(subscription.queue.get_nowait())
+            new_alerts = [alert for alert in new_alerts if alert['seq'] > last_seq]
+            if not new_alerts:
+                continue
+
+            log.info("📢 Sending %d new alerts to frontend", len(new_alerts))
+            await websocket.send_text(json.dumps({
+                'type': 'alerts',
+                'data': [serialize_alert(alert) for alert in new_alerts]
+            }))
+            last_seq = new_alerts[-1]['seq']
+    finally:
+        closed.cancel()
+        alert_bus.unsubscribe(subscription)
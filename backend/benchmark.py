@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""Reproducible offline benchmark of the detection pipeline.
+
+Frames come from a local video file (`--video`, looped) or a generated
+synthetic scene: a person walking across the frame into a zone and a chair
+that gets pushed aside, so both alert types fire. Nothing needs a camera.
+
+Two modes:
+
+* `detect` runs `DetectionPipeline.detect_objects` on every frame back to
+  back and measures the model plus post-processing and drawing.
+* `loop` runs the full capture -> inference -> draw/encode -> alert loop
+  for `--cameras` streams, each fed at `--fps` for `--duration` seconds.
+  `--viewers` attaches video subscribers per camera so frames are encoded
+  as they would be for connected browsers. `--pause-fraction` freezes the
+  scene for part of each crossing, to measure near-duplicate suppression
+  (compare against `--duplicate-delta 0`).
+
+    python -m backend.benchmark --mode loop --cameras 4 --fps 15 --output baseline.json
+    python -m backend.benchmark --mode loop --cameras 4 --fps 15 --baseline baseline.json
+
+With the synthetic scene the default `--backend synthetic` finds objects by
+their key colors at almost no cost, so the rest of the loop can be measured
+without model weights; pass `--backend ultralytics` (or onnx/openvino) for
+real inference cost. `--rtsp URL` reads every camera from a stream instead,
+e.g. a local RTSP server fed with `ffmpeg -re -stream_loop -1 -i clip.mp4`.
+
+The JSON report has throughput, per-stage latency percentiles, the memory
+high-water mark and alert counts. With `--baseline` it is compared to an
+earlier report and the exit status is 1 if throughput, a stage's p95 or
+memory got worse by more than `--tolerance`.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from backend.cameras import DEFAULT_CAMERA_ID
+from backend.detection_pipeline import DetectionPipeline
+from backend.detectors import DEFAULT_BACKEND, DEFAULT_IOU, Detector, create_detector
+from backend.motion import DEFAULT_DUPLICATE_DELTA
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Pure key colors never produced by the scene's background (clipped to 40..200)
+PERSON_COLOR = (255, 0, 0)  # BGR blue: also classified as blue clothing
+CHAIR_COLOR = (255, 0, 255)
+SCENE_CLASSES = {0: ('person', PERSON_COLOR), 56: ('chair', CHAIR_COLOR)}  # COCO ids, as the YOLO weights use
+MIN_KEY_AREA = 100
+
+CROSSING_SECONDS = 4.0  # one walk of the person across the frame; the chair moves once per crossing
+ZONE_START = 0.6  # the zone covers the frame right of this fraction of its width
+# Capture includes waiting for the next frame, so it measures pacing rather than work
+UNCOMPARED_STAGES = {'capture'}
+MIN_LATENCY_DELTA_MS = 1.0  # p95 changes smaller than this are noise, whatever the ratio
+
+
+class SyntheticScene:
+    """Deterministic frames by index: a textured background, a walking person and a chair.
+    For the first `pause` fraction of each crossing nothing moves."""
+
+    def __init__(self, width: int = 640, height: int = 480, fps: float = 15.0, seed: int = 0, pause: float = 0.0):
+        self.width = width
+        self.height = height
+        self.pause = pause
+        self.period = max(2, int(round(CROSSING_SECONDS * fps)))  # frames per crossing
+        rng = np.random.default_rng(seed)
+        texture = rng.integers(40, 201, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+        self.background = cv2.resize(texture, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    def frame(self, index: int):
+        frame = self.background.copy()
+        phase = max(0.0, (index % self.period) / self.period - self.pause) / (1.0 - self.pause)
+        person_w, person_h = self.width // 16, self.height // 4
+        x = int(10 + phase * (self.width - person_w - 20))
+        y = self.height // 2 - person_h // 3
+        cv2.rectangle(frame, (x, y), (x + person_w, y + person_h), PERSON_COLOR, -1)
+
+        # The chair slides sideways during the second half of each crossing and jumps back after
+        chair = self.height // 8
+        shift = int(max(0.0, phase - 0.5) * 2 * self.width * 0.15)
+        cx, cy = self.width // 5 + shift, int(self.height * 0.65)
+        cv2.rectangle(frame, (cx, cy), (cx + chair, cy + chair), CHAIR_COLOR, -1)
+        return frame
+
+    def zone(self):
+        left = int(self.width * ZONE_START)
+        return [(left, 0), (self.width - 1, 0), (self.width - 1, self.height - 1), (left, self.height - 1)]
+
+
+class KeyColorDetector(Detector):
+    """Finds synthetic scene objects by their exact key colors: no model, near-zero cost"""
+
+    backend = "synthetic"
+
+    def __init__(self, weights: str = None, conf: float = 0.5, iou: float = DEFAULT_IOU):
+        super().__init__(conf, iou)
+        self.names = {class_id: name for class_id, (name, _) in SCENE_CLASSES.items()}
+
+    def detect(self, frames):
+        return [self.detect_one(frame) for frame in frames]
+
+    def detect_one(self, frame):
+        boxes, class_ids = [], []
+        for class_id, (_, color) in SCENE_CLASSES.items():
+            mask = cv2.inRange(frame, color, color)
+            _, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            for x, y, w, h, area in stats[1:].tolist():
+                if area >= MIN_KEY_AREA:
+                    boxes.append((x, y, x + w, y + h))
+                    class_ids.append(class_id)
+        return (np.array(boxes, np.float32).reshape(-1, 4), np.full(len(boxes), 0.9, np.float32),
+                np.array(class_ids, np.int64))
+
+
+class VideoFrames:
+    """Frames of a local video file in order, rewinding at the end so it can be read forever"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise SystemExit(f"Could not open {path}")
+
+    def frame(self, index: int):
+        ret, frame = self.cap.read()
+        if not ret:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+            if not ret:
+                raise SystemExit(f"No frames could be read from {self.path}")
+        return frame
+
+
+class PacedCapture:
+    """cv2.VideoCapture stand-in delivering `source.frame(i)` at a fixed rate, like a live camera.
+
+    A reader that falls behind by more than a frame resynchronises instead of
+    bursting to catch up, as a real stream would have dropped those frames.
+    """
+
+    def __init__(self, source, fps: float):
+        self.source = source
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.index = 0
+        self.next_at = None
+        self.opened = True
+
+    def isOpened(self) -> bool:
+        return self.opened
+
+    def set(self, prop, value) -> bool:
+        return False
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        now = time.perf_counter()
+        if self.next_at is not None and self.next_at > now:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = max((self.next_at or now) + self.interval, now)
+        frame = self.source.frame(self.index)
+        self.index += 1
+        return True, frame
+
+    def release(self):
+        self.opened = False
+
+
+def max_rss_mb(who=None):
+    """Peak resident set size of this process so far (or of its largest exited child with
+    `who=resource.RUSAGE_CHILDREN`), or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes on macOS, KiB elsewhere
+
+
+def make_source(args):
+    if args.video:
+        return VideoFrames(args.video)
+    return SyntheticScene(args.width, args.height, args.fps, args.seed, args.pause_fraction)
+
+
+def run_detect(args, pipeline):
+    if pipeline.detector is None:
+        pipeline.start()  # starts the inference worker pool
+    source = make_source(args)
+    for index in range(args.warmup):
+        pipeline.detect_objects(source.frame(index))
+    pipeline.metrics.reset()
+
+    frames = [source.frame(args.warmup + index) for index in range(args.frames)]
+    started = time.perf_counter()
+    for frame in frames:
+        pipeline.detect_objects(frame)
+    elapsed = time.perf_counter() - started
+    pipeline.stop()
+    return {
+        'throughput': {
+            'frames': len(frames),
+            'seconds': round(elapsed, 3),
+            'fps': round(len(frames) / elapsed, 2),
+        },
+    }
+
+
+def run_loop(args, pipeline):
+    zone = None if args.video or args.rtsp else SyntheticScene(args.width, args.height).zone()
+    cameras = []
+    for index in range(args.cameras):
+        options = {'roi_only': args.roi_only, 'duplicate_delta': args.duplicate_delta}
+        if not args.rtsp:
+            options['capture_factory'] = lambda url: PacedCapture(make_source(args), args.fps)
+        camera = pipeline.cameras.add(f"bench-{index}", args.rtsp or f"synthetic://{index}", **options)
+        if zone is not None:
+            camera.zones['bench-zone'] = zone
+        for _ in range(args.viewers):
+            camera.broadcaster.subscribe('binary')
+        cameras.append(camera)
+
+    pipeline.start()
+    time.sleep(args.warmup_seconds)
+    pipeline.metrics.reset()
+    before = {camera.id: (camera.frames.stats(), camera.motion.stats(), camera.duplicates.duplicates)
+              for camera in cameras}
+    first_seq = pipeline.alert_bus.latest_seq
+
+    time.sleep(args.duration)
+    percentiles = pipeline.metrics.percentiles()
+    alerts, _ = pipeline.alert_bus.since(first_seq)
+    after = {camera.id: (camera.frames.stats(), camera.motion.stats(), camera.duplicates.duplicates)
+             for camera in cameras}
+    evidence_dropped = pipeline.evidence.dropped
+    pipeline.stop()
+
+    processed = sum(percentiles.get(camera.id, {}).get('total', {}).get('count', 0) for camera in cameras)
+    counters = Counter()
+    for camera_id, (frames, motion, duplicates) in after.items():
+        old_frames, old_motion, old_duplicates = before[camera_id]
+        counters['captured'] += frames['frames_captured'] - old_frames['frames_captured']
+        counters['dropped'] += frames['frames_dropped'] - old_frames['frames_dropped']
+        counters['inference_skipped'] += motion['inferences_skipped'] - old_motion['inferences_skipped']
+        counters['duplicate'] += duplicates - old_duplicates
+    return {
+        'throughput': {
+            'frames': processed,
+            'seconds': args.duration,
+            'fps': round(processed / args.duration, 2),
+            'fps_per_camera': round(processed / args.duration / len(cameras), 2),
+        },
+        'frames': dict(counters),
+        'alerts': {
+            'total': len(alerts),
+            'by_type': dict(Counter(alert['type'] for alert in alerts)),
+        },
+        'evidence_dropped': evidence_dropped,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Regressions of `report` against `baseline` larger than the relative `tolerance`"""
+    regressions = []
+
+    def check(metric, current, previous, higher_is_better, min_delta=0.0):
+        if current is None or not previous:
+            return
+        worse = previous - current if higher_is_better else current - previous
+        if worse > min_delta and worse / previous > tolerance:
+            regressions.append({'metric': metric, 'baseline': previous, 'current': current,
+                                'change': round((current - previous) / previous, 3)})
+
+    check('throughput.fps', report['throughput']['fps'], baseline['throughput']['fps'], higher_is_better=True)
+    for camera, stages in baseline.get('stages', {}).items():
+        for stage, summary in stages.items():
+            if stage in UNCOMPARED_STAGES:
+                continue
+            current = report['stages'].get(camera, {}).get(stage, {}).get('p95')
+            check(f'stages.{camera}.{stage}.p95', current, summary.get('p95'), higher_is_better=False,
+                  min_delta=MIN_LATENCY_DELTA_MS)
+    check('memory.max_rss_mb', report['memory']['max_rss_mb'], baseline['memory']['max_rss_mb'],
+          higher_is_better=False)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("detect", "loop"), default="loop")
+    parser.add_argument("--video", help="local video clip to loop instead of the synthetic scene")
+    parser.add_argument("--rtsp", help="loop mode: read every camera from this stream instead")
+    parser.add_argument("--backend", help="detector backend (default: synthetic for the synthetic scene, "
+                                          "otherwise DETECTOR_BACKEND / ultralytics)")
+    parser.add_argument("--weights")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--inference-workers", type=int, default=0,
+                        help="run the detector in this many worker processes (0: in-process)")
+    parser.add_argument("--cameras", type=int, default=1)
+    parser.add_argument("--fps", type=float, default=15.0, help="frame rate each camera is fed at")
+    parser.add_argument("--duration", type=float, default=30.0, help="loop mode: measured seconds")
+    parser.add_argument("--warmup-seconds", type=float, default=3.0, help="loop mode: unmeasured seconds first")
+    parser.add_argument("--frames", type=int, default=300, help="detect mode: measured frames")
+    parser.add_argument("--warmup", type=int, default=5, help="detect mode: unmeasured frames first")
+    parser.add_argument("--viewers", type=int, default=0, help="loop mode: video subscribers per camera")
+    parser.add_argument("--roi-only", action="store_true", help="loop mode: detect on zone rectangles only")
+    parser.add_argument("--duplicate-delta", type=float, default=DEFAULT_DUPLICATE_DELTA,
+                        help="loop mode: near-duplicate frame threshold, 0 disables")
+    parser.add_argument("--pause-fraction", type=float, default=0.0,
+                        help="synthetic scene: fraction of each crossing during which nothing moves")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare against; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args()
+    if not 0.0 <= args.pause_fraction < 1.0:
+        parser.error("--pause-fraction must be in [0, 1)")
+
+    synthetic = not (args.video or args.rtsp)
+    backend = args.backend or ("synthetic" if synthetic else os.environ.get("DETECTOR_BACKEND", DEFAULT_BACKEND))
+    if backend == "synthetic":
+        if not synthetic:
+            parser.error("--backend synthetic only detects objects of the synthetic scene")
+        factory, options = KeyColorDetector, {}
+    else:
+        factory, options = create_detector, {'backend': backend, 'weights': args.weights, 'conf': args.conf}
+    # With workers every process builds its own detector when the pipeline starts
+    detector = None if args.inference_workers else factory(**options)
+
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    rss_before = max_rss_mb()
+    try:
+        pipeline = DetectionPipeline(rtsp_url=None, camera_id=DEFAULT_CAMERA_ID, detector=detector,
+                                     photos_dir=os.path.join(workdir, 'photos'), clips_dir=os.path.join(workdir, 'clips'),
+                                     inference_workers=args.inference_workers,
+                                     detector_factory=factory, detector_options=options)
+        # The pipeline's progress messages go to stderr so stdout is only the report
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.mode == "detect":
+                result = run_detect(args, pipeline)
+            else:
+                result = run_loop(args, pipeline)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'config': {
+            'mode': args.mode,
+            'source': args.video or args.rtsp or f"synthetic:{args.width}x{args.height}:seed{args.seed}",
+            'backend': backend,
+            'weights': args.weights,
+            'inference_workers': args.inference_workers,
+            'cameras': args.cameras if args.mode == "loop" else 1,
+            'fps': args.fps if args.mode == "loop" and not args.rtsp else None,
+            'viewers': args.viewers if args.mode == "loop" else 0,
+            'roi_only': args.roi_only,
+            'duplicate_delta': args.duplicate_delta if args.mode == "loop" else None,
+            'pause_fraction': args.pause_fraction if synthetic else None,
+        },
+        **result,
+        'stages': pipeline.metrics.percentiles(),
+        'memory': {
+            'max_rss_mb': max_rss_mb(),
+            'rss_at_start_mb': rss_before,
+            'worker_max_rss_mb': max_rss_mb(resource.RUSAGE_CHILDREN) if args.inference_workers and resource else None,
+        },
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        report['comparison'] = {
+            'baseline': args.baseline,
+            'tolerance': args.tolerance,
+            'config_differs': sorted(key for key, value in baseline.get('config', {}).items()
+                                     if report['config'].get(key) != value),
+            'regressions': regressions,
+        }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
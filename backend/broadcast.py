@@ -0,0 +1,253 @@
+import asyncio
+import base64
+import json
+import struct
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple, Union
+
+import cv2
+
+# Binary video frame: fixed 28-byte big-endian header followed by the raw JPEG.
+#   magic 'F' | version | flags (bit 0: inference skipped) | reserved |
+#   seq u32 | captured_at f64 (unix seconds) | latency_ms f32 | detections u16 | zones u16 |
+#   source width u16 | source height u16
+# The JPEG may be downscaled for the client's quality tier; zone points are in
+# source pixels, so clients scale canvas clicks by source size / JPEG size.
+FRAME_HEADER = struct.Struct('!cBBxIdfHHHH')
+FRAME_MAGIC = b'F'
+FRAME_VERSION = 2
+FLAG_INFERENCE_SKIPPED = 0x01
+
+VIDEO_FORMATS = ('json', 'binary')
+
+# (max width, JPEG quality) per tier, best first; clients start at tier 0
+QUALITY_TIERS = ((800, 90), (640, 75), (480, 60), (320, 45))
+
+Tier = Tuple[int, int]
+
+
+class EncodedFrame:
+    """One annotated frame whose JPEG encodes are shared by every client at the same tier.
+
+    Each (width, quality) variant is encoded at most once, and each wire
+    format of it serialized at most once, no matter how many clients ask.
+    """
+
+    def __init__(self, image, meta: dict):
+        self.image = image
+        self.meta = meta
+        self._lock = threading.Lock()
+        self._jpeg: Dict[Tier, bytes] = {}
+        self._binary: Dict[Tier, bytes] = {}
+        self._json: Dict[Tier, str] = {}
+
+    def has(self, tier: Tier) -> bool:
+        return tier in self._jpeg
+
+    @property
+    def source_size(self) -> Tuple[int, int]:
+        """(width, height) of the frame before any tier downscaling; zone points use these pixels"""
+        height, width = self.image.shape[:2]
+        return width, height
+
+    def size(self, tier: Tier = QUALITY_TIERS[0]) -> Tuple[int, int]:
+        """(width, height) of the JPEG at a tier; frames are only ever scaled down"""
+        height, width = self.image.shape[:2]
+        if width > tier[0]:
+            return tier[0], int(height * tier[0] / width)
+        return width, height
+
+    def jpeg(self, tier: Tier = QUALITY_TIERS[0]) -> bytes:
+        """JPEG bytes for a tier; encodes on first use, so call off the event loop if not `has()`"""
+        with self._lock:
+            if tier not in self._jpeg:
+                image = self.image
+                size = self.size(tier)
+                if size[0] != image.shape[1]:
+                    image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+                _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, tier[1]])
+                self._jpeg[tier] = buffer.tobytes()
+            return self._jpeg[tier]
+
+    def prepare(self, tiers):
+        for tier in tiers:
+            self.jpeg(tier)
+
+    def binary(self, tier: Tier = QUALITY_TIERS[0]) -> bytes:
+        if tier not in self._binary:
+            flags = FLAG_INFERENCE_SKIPPED if self.meta.get('inference_skipped') else 0
+            header = FRAME_HEADER.pack(
+                FRAME_MAGIC, FRAME_VERSION, flags,
+                self.meta.get('seq', 0) & 0xFFFFFFFF,
+                self.meta.get('captured_at', 0.0),
+                self.meta.get('latency_ms', 0.0),
+                min(self.meta.get('detections', 0), 0xFFFF),
+                min(self.meta.get('zones', 0), 0xFFFF),
+                *(min(side, 0xFFFF) for side in self.source_size),
+            )
+            self._binary[tier] = header + self.jpeg(tier)
+        return self._binary[tier]
+
+    def json_text(self, tier: Tier = QUALITY_TIERS[0]) -> str:
+        """Legacy base64-in-JSON message for clients that have not moved to binary"""
+        if tier not in self._json:
+            self._json[tier] = json.dumps({
+                'type': 'frame',
+                'data': base64.b64encode(self.jpeg(tier)).decode('utf-8'),
+                'source_width': self.source_size[0],
+                'source_height': self.source_size[1],
+                **self.meta,
+            })
+        return self._json[tier]
+
+
+Message = Union[str, EncodedFrame]
+
+
+class Subscriber:
+    """One video client: a small drop-oldest queue, its wire format, quality tier and counters.
+
+    Every ADAPT_WINDOW frames the client's tier is re-evaluated: frames
+    dropped because the client fell behind, or slow sends, step it down to a
+    smaller/lower-quality JPEG; a run of clean windows steps it back up.
+    A message identical to the last one offered (the pipeline republishes the
+    same object for near-duplicate frames) is not queued again, since the
+    client already has it or is about to.
+    """
+
+    QUEUE_SIZE = 2
+    ADAPT_WINDOW = 10
+    SLOW_SEND_SECONDS = 0.1  # mean socket write time that marks a client as slow
+    FAST_SEND_SECONDS = 0.02
+    DROP_RATIO_DOWN = 0.2
+    CLEAN_WINDOWS_UP = 3
+
+    def __init__(self, video_format: str = 'json'):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.format = video_format
+        self.tier_index = 0
+        self.connected_at = time.time()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.sends_skipped = 0
+        self.bytes_sent = 0
+        self.bytes_per_second = 0.0
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._adapt_sent = 0
+        self._adapt_dropped = 0
+        self._adapt_send_seconds = 0.0
+        self._clean_windows = 0
+        self._last_offered: Optional[Message] = None
+
+    @property
+    def tier(self) -> Tier:
+        return QUALITY_TIERS[self.tier_index]
+
+    def offer(self, message: Message) -> bool:
+        """Queue a message, discarding the oldest one if the client is behind.
+        Returns False if the client already has it."""
+        if message is self._last_offered:
+            self.sends_skipped += 1
+            return False
+        self._last_offered = message
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.frames_dropped += 1
+            self._adapt_dropped += 1
+        self.queue.put_nowait(message)
+        return True
+
+    def encode(self, message: Message) -> Union[str, bytes]:
+        """Wire payload for this client: text for JSON/errors, bytes for binary frames"""
+        if isinstance(message, EncodedFrame):
+            return message.binary(self.tier) if self.format == 'binary' else message.json_text(self.tier)
+        return message
+
+    def record_sent(self, payload: Union[str, bytes], send_seconds: float = 0.0):
+        size = len(payload) if isinstance(payload, bytes) else len(payload.encode('utf-8'))
+        self.frames_sent += 1
+        self.bytes_sent += size
+        self._window_bytes += size
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.bytes_per_second = self._window_bytes / elapsed
+            self._window_start = now
+            self._window_bytes = 0
+
+        self._adapt_sent += 1
+        self._adapt_send_seconds += send_seconds
+        if self._adapt_sent >= self.ADAPT_WINDOW:
+            self._adapt()
+
+    def _adapt(self):
+        offered = self._adapt_sent + self._adapt_dropped
+        drop_ratio = self._adapt_dropped / offered if offered else 0.0
+        mean_send = self._adapt_send_seconds / self._adapt_sent
+        self._adapt_sent = self._adapt_dropped = 0
+        self._adapt_send_seconds = 0.0
+
+        if drop_ratio > self.DROP_RATIO_DOWN or mean_send > self.SLOW_SEND_SECONDS:
+            self._clean_windows = 0
+            self.tier_index = min(self.tier_index + 1, len(QUALITY_TIERS) - 1)
+        elif drop_ratio == 0 and mean_send < self.FAST_SEND_SECONDS:
+            self._clean_windows += 1
+            if self._clean_windows >= self.CLEAN_WINDOWS_UP:
+                self._clean_windows = 0
+                self.tier_index = max(self.tier_index - 1, 0)
+        else:
+            self._clean_windows = 0
+
+    def stats(self) -> dict:
+        width, quality = self.tier
+        return {
+            'format': self.format,
+            'tier': self.tier_index,
+            'max_width': width,
+            'jpeg_quality': quality,
+            'connected_seconds': round(time.time() - self.connected_at, 1),
+            'frames_sent': self.frames_sent,
+            'frames_dropped': self.frames_dropped,
+            'sends_skipped': self.sends_skipped,
+            'bytes_sent': self.bytes_sent,
+            'bytes_per_second': round(self.bytes_per_second, 1),
+        }
+
+
+class FrameBroadcaster:
+    """Fan out frames produced once by the pipeline to every /ws/video subscriber"""
+
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self.latest: Optional[Message] = None
+        self.sends_skipped = 0
+
+    def subscribe(self, video_format: str = 'json') -> Subscriber:
+        subscriber = Subscriber(video_format)
+        if self.latest is not None:
+            subscriber.offer(self.latest)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, message: Message):
+        """Hand a frame or error message to all subscribers (must run on the event loop)"""
+        self.latest = message
+        for subscriber in self.subscribers:
+            if not subscriber.offer(message):
+                self.sends_skipped += 1
+
+    def active_tiers(self):
+        """Tiers currently in use, so the producer can pre-encode them (safe from other threads)"""
+        return {subscriber.tier for subscriber in list(self.subscribers)}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self.subscribers)
+
+    def client_stats(self):
+        return [subscriber.stats() for subscriber in self.subscribers]
@@ -0,0 +1,150 @@
+import threading
+from typing import Dict, List, Optional
+
+import cv2
+
+from backend.broadcast import FrameBroadcaster
+from backend.clips import DEFAULT_CLIPS_DIR, DEFAULT_POST_SECONDS, DEFAULT_PRE_SECONDS, ClipBuffer
+from backend.colors import TrackColorCache
+from backend.detections import Detections
+from backend.motion import (DEFAULT_DUPLICATE_DELTA, DEFAULT_KEEPALIVE_SECONDS, DEFAULT_MOTION_THRESHOLD,
+                            DuplicateFilter, MotionGate)
+from backend.tracker import Tracker
+from backend.workers import CaptureThread, LatestFrameBuffer
+from backend.zones import ZoneMap
+
+DEFAULT_CAMERA_ID = "default"
+DEFAULT_RTSP_URL = "rtsp://localhost:8554/stream"
+
+
+class Camera:
+    """One registered stream with its own capture worker, frame buffer, viewers and zones"""
+
+    def __init__(self, camera_id: str, url: str, ready: threading.Event,
+                 motion_threshold: float = DEFAULT_MOTION_THRESHOLD,
+                 keepalive_seconds: float = DEFAULT_KEEPALIVE_SECONDS,
+                 duplicate_delta: float = DEFAULT_DUPLICATE_DELTA,
+                 roi_only: bool = False,
+                 clip_pre_seconds: float = DEFAULT_PRE_SECONDS,
+                 clip_post_seconds: float = DEFAULT_POST_SECONDS,
+                 clips_dir: str = DEFAULT_CLIPS_DIR,
+                 metrics=None, capture_factory=cv2.VideoCapture):
+        self.id = camera_id
+        self.url = url
+        self.capture_factory = capture_factory  # url -> VideoCapture-like reader; file and synthetic sources swap it
+        self.frames = LatestFrameBuffer(ready)
+        self.broadcaster = FrameBroadcaster()  # annotated video
+        self.raw_broadcaster = FrameBroadcaster()  # video without overlays, for clients that draw their own
+        self.detection_broadcaster = FrameBroadcaster()  # per-frame detection records, no images
+        self.zones = ZoneMap()
+        self.roi_only = roi_only  # run the detector on zone rectangles only
+        # Only touched by the inference thread
+        self.motion = MotionGate(motion_threshold, keepalive_seconds)
+        self.duplicates = DuplicateFilter(duplicate_delta)
+        self.last_detections = Detections.empty()
+        self.latest = None  # (frame, detections, overlays drawn) of the newest processed frame
+        self.rendered = {}  # broadcaster -> message built for the last frame rendered in full
+        self.tracker = Tracker()
+        self.colors = TrackColorCache()
+        self.clips = ClipBuffer(clips_dir, pre_seconds=clip_pre_seconds, post_seconds=clip_post_seconds)
+        self.metrics = metrics
+        self.cap = None
+        self.capture_thread: Optional[CaptureThread] = None
+
+    def open(self) -> bool:
+        self.cap = self.capture_factory(self.url)
+        # Keep OpenCV's own queue short; the capture thread drains it continuously
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.capture_thread = CaptureThread(self.cap, self.frames, name=f"capture-{self.id}",
+                                            metrics=self.metrics, camera_id=self.id)
+        self.capture_thread.start()
+        return self.cap.isOpened()
+
+    def close(self):
+        if self.capture_thread is not None:
+            self.capture_thread.stop()
+            self.capture_thread.join(timeout=2)
+        if self.cap is not None:
+            self.cap.release()
+        self.clips.flush()
+
+    @property
+    def broadcasters(self):
+        return self.broadcaster, self.raw_broadcaster, self.detection_broadcaster
+
+    @property
+    def connected(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def stats(self) -> dict:
+        return {
+            'id': self.id,
+            'url': self.url,
+            'connected': self.connected,
+            'viewers': self.broadcaster.subscriber_count,
+            'clients': self.broadcaster.client_stats(),
+            'raw_viewers': self.raw_broadcaster.subscriber_count,
+            'detection_subscribers': self.detection_broadcaster.subscriber_count,
+            'zones_count': len(self.zones),
+            'roi_only': self.roi_only,
+            **self.frames.stats(),
+            **self.motion.stats(),
+            **self.duplicates.stats(),
+            'colors_classified': self.colors.classified,
+            'colors_reused': self.colors.reused,
+            **self.clips.stats(),
+        }
+
+
+class CameraRegistry:
+    """Thread-safe set of cameras feeding the shared inference worker.
+
+    Every camera's frame buffer sets `ready`, so one inference thread can wait
+    on all streams at once and batch whatever frames are available.
+    """
+
+    def __init__(self, metrics=None, clips_dir: str = DEFAULT_CLIPS_DIR):
+        self.ready = threading.Event()
+        self.metrics = metrics  # shared by every camera's capture thread
+        self.clips_dir = clips_dir  # where cameras write clips unless given their own
+        self._cameras: Dict[str, Camera] = {}
+        self._lock = threading.Lock()
+
+    def add(self, camera_id: str, url: str, **options) -> Camera:
+        """Register and open a stream; `options` are passed through to Camera"""
+        with self._lock:
+            if camera_id in self._cameras:
+                raise ValueError(f"Camera {camera_id} already exists")
+            camera = Camera(camera_id, url, self.ready, metrics=self.metrics,
+                            **{'clips_dir': self.clips_dir, **options})
+            self._cameras[camera_id] = camera
+        # Opening an RTSP URL can block for seconds; do it outside the lock
+        camera.open()
+        return camera
+
+    def remove(self, camera_id: str) -> Optional[Camera]:
+        with self._lock:
+            camera = self._cameras.pop(camera_id, None)
+        if camera is not None:
+            camera.close()
+        return camera
+
+    def get(self, camera_id: str) -> Optional[Camera]:
+        with self._lock:
+            return self._cameras.get(camera_id)
+
+    def all(self) -> List[Camera]:
+        with self._lock:
+            return list(self._cameras.values())
+
+    def frame_sources(self):
+        """(camera, frame buffer) pairs for the inference thread"""
+        return [(camera, camera.frames) for camera in self.all()]
+
+    def close_all(self):
+        for camera in self.all():
+            self.remove(camera.id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cameras)
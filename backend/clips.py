@@ -0,0 +1,186 @@
+import os
+import struct
+import threading
+from collections import deque
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from backend.broadcast import QUALITY_TIERS
+
+DEFAULT_CLIPS_DIR = "captured_clips"
+CLIP_TIER = QUALITY_TIERS[1]  # (max width, JPEG quality) of recorded frames, shared with viewers at that tier
+DEFAULT_PRE_SECONDS = 0.0  # opt-in: a pre-event ring means drawing and encoding every frame
+DEFAULT_POST_SECONDS = 5.0
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024  # per camera ring buffer; a clip being recorded has the same cap
+MAX_CLIP_SECONDS = 60.0  # repeated alerts extend a clip at most this far past its first event
+
+
+class ClipFrame(NamedTuple):
+    captured_at: float
+    jpeg: bytes
+    width: int
+    height: int
+
+
+def chunk(fourcc: bytes, data: bytes) -> bytes:
+    return fourcc + struct.pack('<I', len(data)) + data + (b'\0' if len(data) % 2 else b'')
+
+
+def riff_list(list_type: bytes, data: bytes) -> bytes:
+    return chunk(b'LIST', list_type + data)
+
+
+def mjpeg_avi(frames: List[ClipFrame]) -> bytes:
+    """Pack already-encoded JPEG frames into an MJPEG AVI without decoding them.
+
+    Frame rate is taken from the capture timestamps, and the frame size
+    from the first frame.
+    """
+    width, height = frames[0].width, frames[0].height
+    duration = frames[-1].captured_at - frames[0].captured_at
+    fps = (len(frames) - 1) / duration if len(frames) > 1 and duration > 0 else 10.0
+    usec_per_frame = int(round(1_000_000 / fps))
+    rate_scale = (int(round(fps * 1000)), 1000)
+    largest = max(len(frame.jpeg) for frame in frames)
+
+    movi = bytearray()
+    index = bytearray()
+    for frame in frames:
+        offset = len(movi) + 4  # idx1 offsets count from the 'movi' fourcc
+        movi += chunk(b'00dc', frame.jpeg)
+        index += b'00dc' + struct.pack('<III', 0x10, offset, len(frame.jpeg))
+
+    avih = struct.pack('<IIIIIIIIII16x', usec_per_frame, int(largest * fps), 0, 0x10, len(frames),
+                       0, 1, largest, width, height)
+    strh = b'vidsMJPG' + struct.pack('<IHHIIIIIIIIhhhh', 0, 0, 0, 0, rate_scale[1], rate_scale[0], 0,
+                                     len(frames), largest, 0xFFFFFFFF, 0, 0, 0, width, height)
+    strf = struct.pack('<IiiHH4sIiiII', 40, width, height, 1, 24, b'MJPG', width * height * 3, 0, 0, 0, 0)
+    hdrl = riff_list(b'hdrl', chunk(b'avih', avih) + riff_list(b'strl', chunk(b'strh', strh) + chunk(b'strf', strf)))
+    body = b'AVI ' + hdrl + riff_list(b'movi', bytes(movi)) + chunk(b'idx1', bytes(index))
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+class ClipRecording:
+    def __init__(self, path: str, prefix: str, started_at: float, frames: List[ClipFrame], until: float,
+                 limit: float, writer):
+        self.path = path
+        self.prefix = prefix
+        self.started_at = started_at
+        self.frames = frames
+        self.size = sum(len(frame.jpeg) for frame in frames)
+        self.until = until
+        self.limit = limit
+        self.writer = writer
+
+    def add(self, frame: ClipFrame):
+        self.frames.append(frame)
+        self.size += len(frame.jpeg)
+
+
+class ClipBuffer:
+    """Last `pre_seconds` of a camera's encoded frames, turned into clips on alerts.
+
+    Frames are the JPEG bytes the video path already produced, kept by
+    reference, so recording never re-encodes. `trigger()` starts a clip from
+    the buffered frames and keeps adding frames for `post_seconds`; alerts
+    during a clip extend it. The finished MJPEG AVI is written by the
+    evidence writer. The ring and the clip in progress are each capped at
+    `max_bytes` (the ring drops its oldest frames, the clip finishes early),
+    and they mostly share frames, so a camera holds at most twice that.
+    Frames only need to be fed while `wants_frames`: with no pre-event ring
+    (the default) that is just while a clip records, so an idle camera
+    draws and encodes nothing for clips.
+
+    Fed by whichever thread finishes the camera's batches (the inference
+    thread, or the pool's result collector with worker processes) and
+    flushed when the camera is removed, so every method takes a lock.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CLIPS_DIR, pre_seconds: float = DEFAULT_PRE_SECONDS,
+                 post_seconds: float = DEFAULT_POST_SECONDS, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_bytes = max_bytes
+        self._ring: deque = deque()
+        self._ring_bytes = 0
+        self._recording: Optional[ClipRecording] = None
+        self._lock = threading.Lock()
+        self.clips_started = 0
+        self.clips_written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.pre_seconds > 0 or self.post_seconds > 0
+
+    @property
+    def wants_frames(self) -> bool:
+        """Whether add() has anything to do: a pre-event ring is kept or a clip is recording"""
+        return self.pre_seconds > 0 or self._recording is not None
+
+    def add(self, captured_at: float, jpeg: bytes, width: int, height: int):
+        frame = ClipFrame(captured_at, jpeg, width, height)
+        with self._lock:
+            self._ring.append(frame)
+            self._ring_bytes += len(jpeg)
+            while self._ring and (self._ring[0].captured_at < captured_at - self.pre_seconds
+                                  or self._ring_bytes > self.max_bytes):
+                self._ring_bytes -= len(self._ring.popleft().jpeg)
+
+            recording = self._recording
+            if recording is not None:
+                recording.add(frame)
+                if captured_at >= recording.until or recording.size > self.max_bytes:
+                    self._finish()
+
+    def trigger(self, now: float, prefix: str, writer) -> Optional[str]:
+        """Start (or extend) a clip around an event at `now`; returns the clip's future path"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            recording = self._recording
+            if recording is not None:
+                recording.until = min(max(recording.until, now + self.post_seconds), recording.limit)
+                return recording.path
+
+            when = datetime.fromtimestamp(now)
+            path = writer.new_path(prefix, 'avi', when, directory=self.directory)
+            self._recording = ClipRecording(path, prefix, now, list(self._ring), now + self.post_seconds,
+                                            now + MAX_CLIP_SECONDS, writer)
+            self.clips_started += 1
+            return path
+
+    def _finish(self):
+        recording, self._recording = self._recording, None
+        if recording is None:
+            return
+        if not recording.frames:
+            recording.writer.lost('clip', recording.path)  # alerts were already given this path
+            return
+        frames = recording.frames
+
+        def write():
+            os.makedirs(self.directory, exist_ok=True)
+            data = mjpeg_avi(frames)
+            with open(recording.path, 'xb') as f:
+                f.write(data)
+            recording.writer.saved('clip', recording.path, recording.prefix, recording.started_at, len(data))
+            self.clips_written += 1
+            print(f"🎞️ CLIP SAVED: {recording.path} ({len(frames)} frames)")
+
+        recording.writer.submit(write, 'clip', recording.path)
+
+    def flush(self):
+        """Finish the clip still recording, if any, with the frames it has"""
+        with self._lock:
+            if self._recording is not None:
+                self._finish()
+
+    def stats(self) -> dict:
+        return {
+            'clip_buffer_frames': len(self._ring),
+            'clip_buffer_bytes': self._ring_bytes,
+            'clip_recording': self._recording is not None,
+            'clips_started': self.clips_started,
+            'clips_written': self.clips_written,
+        }
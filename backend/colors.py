@@ -0,0 +1,147 @@
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+# Color buckets as inclusive OpenCV HSV ranges (H 0-179, S/V 0-255), same as cv2.inRange
+BUCKET_RANGES = (
+    ('Red', (0, 50, 50), (10, 255, 255)),
+    ('Blue', (100, 50, 50), (130, 255, 255)),
+    ('Green', (40, 50, 50), (80, 255, 255)),
+    ('Yellow', (20, 50, 50), (30, 255, 255)),
+    ('Black', (0, 0, 0), (180, 255, 50)),
+    ('White', (0, 0, 200), (180, 30, 255)),
+    ('Purple', (130, 50, 50), (160, 255, 255)),
+    ('FabricRed', (0, 50, 50), (20, 255, 255)),  # wider red used for caps and hoods
+)
+BUCKET_NAMES = tuple(name for name, _, _ in BUCKET_RANGES)
+
+# Dominant clothing color is picked among these, first one wins a tie
+CLOTHING_BUCKETS = ('Red', 'Blue', 'Green', 'Yellow', 'Black', 'White', 'Purple')
+# Manufactured-looking colors whose share of the head region marks it as covered
+FABRIC_BUCKETS = ('Black', 'Blue', 'FabricRed', 'Green', 'White')
+HEAD_COVERED_RATIO = 0.4
+
+
+# Larger crops are classified on a strided subsample of about this many pixels
+MAX_SAMPLE_PIXELS = 4096
+
+
+def bucket_tables(ranges=BUCKET_RANGES):
+    """Per-channel cv2.LUT tables of bucket bits for H, S and V.
+
+    Every range is a box in HSV space, so a pixel's buckets are the AND of
+    the bits its H, S and V values each allow: three table lookups give
+    every pixel an 8-bit code of all the buckets it falls into.
+    """
+    tables = np.zeros((3, 256), np.uint8)
+    for bit, (_, lower, upper) in enumerate(ranges):
+        for channel in range(3):
+            tables[channel, lower[channel]:upper[channel] + 1] |= 1 << bit
+    return tables
+
+
+H_TABLE, S_TABLE, V_TABLE = bucket_tables()
+# (256 codes, buckets) 0/1 matrix: code histogram @ MEMBERSHIP = per-bucket pixel counts
+MEMBERSHIP = ((np.arange(256)[:, None] >> np.arange(len(BUCKET_RANGES))[None, :]) & 1).astype(np.int64)
+
+
+def sample(region):
+    """Strided view of the region with at most about MAX_SAMPLE_PIXELS pixels"""
+    step = int(np.ceil(np.sqrt(region.shape[0] * region.shape[1] / MAX_SAMPLE_PIXELS)))
+    return region[::step, ::step] if step > 1 else region
+
+
+def bucket_codes(region):
+    """BGR region -> per-pixel bucket bit codes, from a single HSV conversion"""
+    h, s, v = cv2.split(cv2.cvtColor(np.ascontiguousarray(region), cv2.COLOR_BGR2HSV))
+    return cv2.bitwise_and(cv2.bitwise_and(cv2.LUT(h, H_TABLE), cv2.LUT(s, S_TABLE)), cv2.LUT(v, V_TABLE))
+
+
+def bucket_counts(codes) -> np.ndarray:
+    """Pixel count of every bucket (overlapping buckets each count the pixel)"""
+    histogram = cv2.calcHist([codes], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+    return histogram @ MEMBERSHIP
+
+
+def counts_by_name(counts) -> Dict[str, int]:
+    return dict(zip(BUCKET_NAMES, counts.tolist()))
+
+
+def dominant_color(counts) -> str:
+    by_name = counts_by_name(counts)
+    best = max(CLOTHING_BUCKETS, key=lambda name: by_name[name])
+    return best if by_name[best] > 0 else "Unknown"
+
+
+def head_coverage(counts, total_pixels) -> float:
+    by_name = counts_by_name(counts)
+    return sum(by_name[name] for name in FABRIC_BUCKETS) / total_pixels
+
+
+def person_regions(person_bbox):
+    """x1, y1, x2 and the row offsets from y1 where the head (top 20%) ends and the
+    torso (20%-80%, starting where the head ends) ends"""
+    x1, y1, x2, y2 = person_bbox
+    height = y2 - y1
+    head_end = int(height * 0.2)
+    torso_end = int(height * 0.8)
+    return x1, y1, x2, head_end, torso_end
+
+
+def clothing_color(frame, person_bbox) -> str:
+    x1, y1, x2, torso_start, torso_end = person_regions(person_bbox)
+    torso = frame[y1 + torso_start:y1 + torso_end, x1:x2]
+    if torso.size == 0:
+        return "Unknown"
+    return dominant_color(bucket_counts(bucket_codes(sample(torso))))
+
+
+def head_fabric_ratio(frame, person_bbox) -> Optional[float]:
+    """Share of fabric-colored pixels in the head region, or None if it is too small"""
+    x1, y1, x2, head_end, _ = person_regions(person_bbox)
+    if head_end < 10:
+        return None
+    head = frame[y1:y1 + head_end, x1:x2]
+    if head.size == 0:
+        return None
+    head = sample(head)
+    return head_coverage(bucket_counts(bucket_codes(head)), head.shape[0] * head.shape[1])
+
+
+def box_iou(a, b) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class TrackColorCache:
+    """Clothing color per track, reclassified only every `refresh` frames or
+    when the track's box has changed substantially (IoU below `min_iou`)"""
+
+    def __init__(self, refresh: int = 15, min_iou: float = 0.7):
+        self.refresh = refresh
+        self.min_iou = min_iou
+        self._entries: Dict[int, list] = {}  # track id -> [color, box, frames since classified]
+        self.classified = 0
+        self.reused = 0
+
+    def colors(self, frame, track_ids, boxes, live_track_ids) -> List[str]:
+        result = []
+        for track_id, box in zip(track_ids.tolist(), boxes.tolist()):
+            entry = self._entries.get(track_id)
+            if entry is None or entry[2] >= self.refresh or box_iou(entry[1], box) < self.min_iou:
+                entry = [clothing_color(frame, box), box, 0]
+                self._entries[track_id] = entry
+                self.classified += 1
+            else:
+                self.reused += 1
+            entry[2] += 1
+            result.append(entry[0])
+
+        live = set(live_track_ids.tolist())
+        for track_id in [t for t in self._entries if t not in live]:
+            del self._entries[track_id]
+        return result
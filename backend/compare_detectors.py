@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Compare detector backends for throughput and accuracy on a local video clip.
+
+The first backend is the reference: its detections stand in for ground
+truth, and every other backend reports mAP@0.5 against it together with
+its speedup.
+
+    python -m backend.compare_detectors --video clip.mp4 \
+        --backend ultralytics:yolov8n.pt --backend onnx:yolov8n.onnx \
+        --backend openvino:yolov8n_int8_openvino_model
+
+Pass `--export` to create the ONNX / OpenVINO INT8 weights from the
+PyTorch weights first.
+"""
+
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from backend.detectors import DEFAULT_WEIGHTS, create_detector, export_weights
+
+
+def read_clip(path, max_frames):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"No frames could be read from {path}")
+    return frames
+
+
+def box_iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def average_precision(recall, precision):
+    """All-point interpolated AP (VOC 2010+ / COCO style)"""
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    steps = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def mean_average_precision(predictions, references, iou_threshold=0.5):
+    """mAP of per-frame predictions against per-frame reference detections"""
+    classes = set()
+    for _, _, class_ids in references:
+        classes.update(class_ids.tolist())
+
+    aps = []
+    for cls in sorted(classes):
+        scored = []  # (confidence, frame index, box)
+        total = 0
+        for index, ((boxes, confidences, class_ids), (ref_boxes, _, ref_ids)) in enumerate(zip(predictions, references)):
+            total += int((ref_ids == cls).sum())
+            scored.extend((conf, index, box) for box, conf in zip(boxes[class_ids == cls], confidences[class_ids == cls]))
+        if total == 0:
+            continue
+
+        scored.sort(key=lambda item: -item[0])
+        matched = {}
+        hits = np.zeros(len(scored))
+        for rank, (_, index, box) in enumerate(scored):
+            ref_boxes, _, ref_ids = references[index]
+            candidates = ref_boxes[ref_ids == cls]
+            if not len(candidates):
+                continue
+            used = matched.setdefault(index, np.zeros(len(candidates), bool))
+            ious = box_iou(box, candidates)
+            ious[used] = 0
+            best = int(ious.argmax())
+            if ious[best] >= iou_threshold:
+                used[best] = True
+                hits[rank] = 1
+
+        true_positives = np.cumsum(hits)
+        recall = true_positives / total
+        precision = true_positives / np.arange(1, len(scored) + 1)
+        aps.append(average_precision(recall, precision) if len(scored) else 0.0)
+
+    return float(np.mean(aps)) if aps else 1.0
+
+
+def run_backend(detector, frames, batch_size, warmup):
+    for _ in range(warmup):
+        detector.detect(frames[:batch_size])
+
+    outputs = []
+    start = time.perf_counter()
+    for offset in range(0, len(frames), batch_size):
+        outputs.extend(detector.detect(frames[offset:offset + batch_size]))
+    elapsed = time.perf_counter() - start
+    return outputs, elapsed
+
+
+def parse_backend(spec):
+    backend, _, weights = spec.partition(":")
+    return backend, weights or DEFAULT_WEIGHTS.get(backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", required=True, help="local video clip to run every backend on")
+    parser.add_argument("--backend", action="append", dest="backends",
+                        help="backend[:weights]; the first one is the accuracy reference "
+                             "(default: ultralytics, onnx and openvino)")
+    parser.add_argument("--frames", type=int, default=200, help="maximum number of frames to use")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--conf", type=float, default=0.25,
+                        help="confidence threshold (lower than serving so mAP sees the full ranking)")
+    parser.add_argument("--export", action="store_true",
+                        help="export ONNX/OpenVINO INT8 weights from the reference .pt weights first")
+    args = parser.parse_args()
+
+    specs = [parse_backend(spec) for spec in (args.backends or ["ultralytics", "onnx", "openvino"])]
+    if args.export:
+        reference_weights = specs[0][1]
+        specs = [(backend, export_weights(reference_weights, backend) if backend != "ultralytics" else weights)
+                 for backend, weights in specs]
+
+    frames = read_clip(args.video, args.frames)
+    report = {"video": args.video, "frames": len(frames), "batch_size": args.batch_size, "backends": []}
+    reference = None
+    reference_fps = None
+
+    for backend, weights in specs:
+        detector = create_detector(backend, weights, conf=args.conf)
+        outputs, elapsed = run_backend(detector, frames, args.batch_size, args.warmup)
+        fps = len(frames) / elapsed
+        if reference is None:
+            reference, reference_fps = outputs, fps
+        mean_ap = mean_average_precision(outputs, reference)
+        report["backends"].append({
+            "backend": backend,
+            "weights": weights,
+            "fps": round(fps, 2),
+            "ms_per_frame": round(1000 * elapsed / len(frames), 2),
+            "speedup": round(fps / reference_fps, 2),
+            "map50_vs_reference": round(mean_ap, 4),
+            "map50_delta": round(mean_ap - 1.0, 4),
+            "detections": int(sum(len(boxes) for boxes, _, _ in outputs)),
+        })
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
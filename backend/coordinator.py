@@ -0,0 +1,675 @@
+#!/usr/bin/env python3
+"""Coordinator: shard camera streams across several backend nodes behind one API.
+
+Every node is an ordinary `backend.main` server. The coordinator keeps the
+list of cameras (with their zones and ROI setting), assigns each camera to a
+node by consistent hashing and keeps the nodes in line with that assignment:
+when a node joins, fails its health checks or is removed, only the cameras
+whose place on the ring changed move. Alerts from every node are merged
+into one `/ws/alerts` stream; `/health`, `/api/cameras`, `/api/alerts` and
+`/api/photos` are merged views; `/ws/video` and `/ws/detections` are relayed
+from whichever node runs the camera.
+
+    python -m backend.coordinator --spawn 3     # three local nodes on ports 8101-8103
+    python -m backend.coordinator --node http://10.0.0.5:8002 --node http://10.0.0.6:8002
+
+The frontend talks to the coordinator (port 8002) as it would to a single server.
+"""
+
+import argparse
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set
+from urllib.parse import quote, urlencode
+
+import httpx
+import websockets
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+
+from backend.alerts import AlertBus, stream_alerts, wait_closed
+from backend.cameras import DEFAULT_CAMERA_ID, DEFAULT_RTSP_URL
+from backend.store import MAX_PAGE_SIZE, encode_cursor
+
+VIRTUAL_NODES = 64  # ring points per node; more points spread cameras more evenly
+HEALTH_INTERVAL = 2.0
+HEALTH_TIMEOUT = 2.0
+REQUEST_TIMEOUT = 30.0  # adding a camera on a node waits for its RTSP connection
+FAILURES_BEFORE_REMOVAL = 2  # missed health checks before a node's cameras move elsewhere
+ALERT_RECONNECT_SECONDS = 1.0
+RELAY_CHECK_SECONDS = 1.0  # how often a video relay checks whether its camera moved
+DEFAULT_BASE_PORT = 8101
+PROXIED_PHOTO_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control')
+
+
+class HashRing:
+    """Consistent hashing with virtual nodes: adding or removing one of N nodes
+    moves only about 1/N of the keys, and always to or from that node"""
+
+    def __init__(self, replicas: int = VIRTUAL_NODES):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def add(self, node: str):
+        for replica in range(self.replicas):
+            point = self.hash(f"{node}#{replica}")
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove(self, node: str):
+        self._points = [point for point in self._points if self._owners[point] != node]
+        self._owners = {point: self._owners[point] for point in self._points}
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, self.hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+    @property
+    def nodes(self) -> Set[str]:
+        return set(self._owners.values())
+
+
+class Node:
+    """A backend server as seen from the coordinator"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.healthy = False
+        self.draining = False  # being removed: keeps running its cameras until they have moved
+        self.failures = 0
+        self.error: Optional[str] = None
+        self.health: Optional[dict] = None  # last /health response
+        self.cameras: Set[str] = set()  # camera ids it reported or was since given
+        self.alert_seq = 0  # last alert seq of this node merged into the coordinator's bus
+        self.alert_epoch: Optional[str] = None  # the node's alert bus run alert_seq belongs to
+        self.alert_task: Optional[asyncio.Task] = None
+
+    @property
+    def ws_url(self) -> str:
+        return 'ws' + self.url[len('http'):]  # http -> ws, https -> wss
+
+    def stats(self) -> dict:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'draining': self.draining,
+            'failures': self.failures,
+            'error': self.error,
+            'cameras': sorted(self.cameras),
+            'alert_seq': self.alert_seq,
+        }
+
+
+def encode_page_cursor(positions: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(positions).encode()).decode()
+
+
+def decode_page_cursor(cursor: str) -> dict:
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+
+class Coordinator:
+    """Camera assignment, node health and alert merging; all state lives on the event loop.
+
+    `reconcile()` is the only thing that changes what nodes run: it starts
+    every camera on its ring owner first and only then stops copies elsewhere,
+    so a moving camera is never down. It runs after every change and on every
+    health round, which also repairs nodes that restarted and lost their cameras.
+    """
+
+    def __init__(self, node_urls=(), default_camera_url: Optional[str] = None,
+                 health_interval: float = HEALTH_INTERVAL):
+        self.ring = HashRing()
+        self.nodes: Dict[str, Node] = {}
+        self.cameras: Dict[str, dict] = {}  # camera id -> POST /api/cameras body
+        self.zones: Dict[str, Dict[str, list]] = {}  # camera id -> zone id -> points
+        self.alert_bus = AlertBus()
+        self.seed_nodes = list(node_urls)
+        self.default_camera_url = default_camera_url
+        self.health_interval = health_interval
+        self.client: Optional[httpx.AsyncClient] = None
+        self.processes: List[subprocess.Popen] = []  # local nodes started with --spawn, stopped with us
+        self._lock: Optional[asyncio.Lock] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT)
+        self._lock = asyncio.Lock()
+        if self.default_camera_url:
+            self.cameras[DEFAULT_CAMERA_ID] = {'id': DEFAULT_CAMERA_ID, 'url': self.default_camera_url}
+        for url in self.seed_nodes:
+            await self.add_node(url)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        tasks = [self._health_task] + [node.alert_task for node in self.nodes.values()]
+        for task in tasks:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(task for task in tasks if task is not None), return_exceptions=True)
+        await self.client.aclose()
+        await asyncio.to_thread(stop_processes, self.processes)
+
+    def owner(self, camera_id: str) -> Optional[Node]:
+        url = self.ring.node_for(camera_id)
+        return self.nodes.get(url) if url is not None else None
+
+    def assignment(self) -> Dict[str, Optional[str]]:
+        return {camera_id: self.ring.node_for(camera_id) for camera_id in sorted(self.cameras)}
+
+    async def call(self, node: Node, method: str, path: str, **kwargs) -> dict:
+        """JSON response of one node endpoint, or an error dict if the node could not be reached"""
+        try:
+            response = await self.client.request(method, f"{node.url}{path}", **kwargs)
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            return {"status": "error", "message": f"{node.url}: {e or type(e).__name__}"}
+
+    # Nodes
+
+    async def add_node(self, url: str) -> Node:
+        async with self._lock:
+            node = self.nodes.get(url.rstrip('/'))
+            if node is None:
+                node = self.nodes[url.rstrip('/')] = Node(url)
+                node.alert_task = asyncio.create_task(self._follow_alerts(node))
+            node.draining = False
+            await self.check(node)
+            await self.reconcile()
+        return node
+
+    async def remove_node(self, url: str) -> Optional[Node]:
+        """Move a node's cameras to the others, stop them there, and forget the node"""
+        async with self._lock:
+            node = self.nodes.get(url.rstrip('/'))
+            if node is None:
+                return None
+            node.draining = True
+            self.ring.remove(node.url)
+            await self.reconcile()
+            del self.nodes[node.url]
+        node.alert_task.cancel()
+        print(f"✅ Node removed: {node.url}")
+        return node
+
+    async def check(self, node: Node):
+        """Poll a node's /health. A healthy node is on the ring; after
+        FAILURES_BEFORE_REMOVAL missed checks it leaves it and its cameras move."""
+        try:
+            response = await self.client.get(f"{node.url}/health", timeout=HEALTH_TIMEOUT)
+            response.raise_for_status()
+            node.health = response.json()
+            node.cameras = {camera['id'] for camera in node.health.get('cameras', [])}
+            node.failures = 0
+            node.error = None
+            healthy = True
+        except (httpx.HTTPError, ValueError) as e:
+            node.failures += 1
+            node.error = str(e) or type(e).__name__
+            healthy = node.healthy and node.failures < FAILURES_BEFORE_REMOVAL
+
+        if healthy and not node.draining:
+            self.ring.add(node.url)
+        elif not healthy:
+            self.ring.remove(node.url)
+        if healthy != node.healthy:
+            print(f"✅ Node joined: {node.url}" if healthy else f"❌ Node unavailable: {node.url} ({node.error})")
+        node.healthy = healthy
+
+    async def _health_loop(self):
+        while True:
+            async with self._lock:
+                await asyncio.gather(*(self.check(node) for node in list(self.nodes.values())))
+                await self.reconcile()
+            await asyncio.sleep(self.health_interval)
+
+    # Cameras
+
+    async def reconcile(self):
+        """Make every healthy node run exactly the cameras the ring gives it (call with the lock held)"""
+        for camera_id in list(self.cameras):
+            node = self.owner(camera_id)
+            if node is not None and camera_id not in node.cameras:
+                await self._start_camera(node, camera_id)
+
+        for node in [node for node in self.nodes.values() if node.healthy]:
+            for camera_id in list(node.cameras):
+                owner = self.owner(camera_id)
+                # Only stop a copy once the owner runs the camera, unless it was deleted
+                if owner is not node and (camera_id not in self.cameras or
+                                          (owner is not None and camera_id in owner.cameras)):
+                    await self._stop_camera(node, camera_id)
+
+    async def _start_camera(self, node: Node, camera_id: str) -> dict:
+        result = await self.call(node, 'POST', '/api/cameras', json=self.cameras[camera_id])
+        if result.get('status') == 'error' and 'already exists' not in result.get('message', ''):
+            print(f"❌ Could not start camera {camera_id} on {node.url}: {result.get('message')}")
+            return result
+        node.cameras.add(camera_id)
+        for zone_id, points in self.zones.get(camera_id, {}).items():
+            await self.call(node, 'POST', '/api/zones', json={'id': zone_id, 'points': points, 'camera_id': camera_id})
+        print(f"✅ Camera {camera_id} assigned to {node.url}")
+        return result
+
+    async def _stop_camera(self, node: Node, camera_id: str):
+        result = await self.call(node, 'DELETE', f"/api/cameras/{quote(camera_id, safe='')}")
+        if result.get('status') == 'error' and 'not found' not in result.get('message', ''):
+            print(f"❌ Could not stop camera {camera_id} on {node.url}: {result.get('message')}")
+            return
+        node.cameras.discard(camera_id)
+
+    async def add_camera(self, spec: dict) -> dict:
+        camera_id = spec['id']
+        async with self._lock:
+            if camera_id in self.cameras:
+                return {"status": "error", "message": f"Camera {camera_id} already exists"}
+            self.cameras[camera_id] = spec
+            node = self.owner(camera_id)
+            if node is None:
+                return {"status": "success", "message": f"Camera {camera_id} queued until a node is available",
+                        "node": None}
+            result = await self._start_camera(node, camera_id)
+            if result.get('status') == 'error':
+                del self.cameras[camera_id]
+                return result
+            return {**result, "node": node.url}
+
+    async def remove_camera(self, camera_id: str) -> dict:
+        async with self._lock:
+            if self.cameras.pop(camera_id, None) is None:
+                return {"status": "error", "message": f"Camera {camera_id} not found"}
+            self.zones.pop(camera_id, None)
+            await self.reconcile()
+        return {"status": "success", "message": f"Camera {camera_id} removed successfully"}
+
+    async def forward(self, camera_id: str, method: str, path: str, **kwargs) -> dict:
+        """Send a camera-specific request to the node running the camera, if any"""
+        node = self.owner(camera_id)
+        if node is None or camera_id not in node.cameras:
+            return {"status": "success", "message": f"Saved; applied when {camera_id} is running on a node"}
+        return {**await self.call(node, method, path, **kwargs), "node": node.url}
+
+    # Alerts
+
+    async def _follow_alerts(self, node: Node):
+        """Merge one node's /ws/alerts into the coordinator's bus, resuming after reconnects"""
+        while True:
+            try:
+                url = f"{node.ws_url}/ws/alerts?since={node.alert_seq}"
+                if node.alert_epoch is not None:
+                    url += f"&epoch={node.alert_epoch}"
+                async with websockets.connect(url) as upstream:
+                    async for text in upstream:
+                        message = json.loads(text)
+                        if message.get('type') == 'connection_status':
+                            node.alert_epoch = message.get('epoch')
+                        if message.get('type') != 'alerts':
+                            continue
+                        if message.get('reset'):
+                            # The node restarted and numbers its alerts from 1 again
+                            node.alert_seq = 0
+                        for alert in message.get('data', []):
+                            if alert.get('seq', 0) <= node.alert_seq:
+                                continue  # the greeting has no seq; replays are already merged
+                            node.alert_seq = alert['seq']
+                            self.alert_bus.publish({**alert, 'node': node.url})
+            except asyncio.CancelledError:
+                raise
+            except (websockets.exceptions.WebSocketException, OSError, ValueError):
+                pass
+            await asyncio.sleep(ALERT_RECONNECT_SECONDS)
+
+    # Merged views
+
+    async def merged_page(self, path: str, key: str, params: dict, cursor: Optional[str], limit: int):
+        """One newest-first page across every node's `path` listing.
+
+        The returned cursor holds each node's own keyset cursor (False once a
+        node is exhausted), so the next page resumes every node where this
+        page stopped taking its rows. A node that is down or fails to answer
+        keeps its position for later pages and is listed as unavailable.
+        Returns (rows, next cursor, unavailable node urls).
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        positions = decode_page_cursor(cursor) if cursor else {}
+        pending = [node for node in self.nodes.values() if positions.get(node.url) is not False]
+        params = {name: value for name, value in params.items() if value is not None}
+
+        async def fetch(node):
+            if not node.healthy:
+                return node, [], None, False
+            query = {**params, 'limit': limit}
+            if positions.get(node.url):
+                query['cursor'] = positions[node.url]
+            result = await self.call(node, 'GET', path, params=query)
+            return node, result.get(key) or [], result.get('next_cursor'), key in result
+
+        pages = await asyncio.gather(*(fetch(node) for node in pending))
+        merged = sorted(((row, node) for node, rows, _, _ in pages for row in rows),
+                        key=lambda item: (item[0]['timestamp'], item[0]['id']), reverse=True)[:limit]
+        taken = Counter(node.url for _, node in merged)
+        for node, rows, next_cursor, ok in pages:
+            count = taken[node.url]
+            if count:
+                positions[node.url] = encode_cursor(rows[count - 1])
+            # Only a successful last page ends a node; a failed call leaves its position alone
+            if ok and count == len(rows) and next_cursor is None:
+                positions[node.url] = False
+        unavailable = [node.url for node, _, _, ok in pages if not ok]
+        more = any(positions.get(node.url) is not False for node in pending)
+        rows = [{**row, 'node': node.url} for row, node in merged]
+        return rows, encode_page_cursor(positions) if more else None, unavailable
+
+    def health(self) -> dict:
+        healthy = [node for node in self.nodes.values() if node.healthy and node.health]
+        return {
+            "status": "healthy" if healthy else "degraded",
+            "role": "coordinator",
+            "model_loaded": bool(healthy) and all(node.health.get('model_loaded') for node in healthy),
+            "rtsp_connected": any(node.health.get('rtsp_connected') for node in healthy),
+            "cameras": [{**camera, 'node': node.url} for node in healthy for camera in node.health.get('cameras', [])],
+            "zones_count": sum(len(zones) for zones in self.zones.values()),
+            "alerts_count": len(self.alert_bus),
+            "latest_alert_seq": self.alert_bus.latest_seq,
+            "assignment": self.assignment(),
+            "nodes": [{**node.stats(), 'health': node.health} for node in self.nodes.values()],
+        }
+
+    async def relay(self, websocket: WebSocket, path: str, camera_id: str, query: str):
+        """Pipe the camera's node's `path` websocket to a client, reconnecting to the
+        new node when the camera moves. Returns as soon as the client disconnects,
+        even while the upstream sends nothing (a still scene or a stalled camera)."""
+        closed = asyncio.ensure_future(wait_closed(websocket))
+        try:
+            while not closed.done():
+                node = self.owner(camera_id)
+                if camera_id not in self.cameras or node is None:
+                    await websocket.send_text(json.dumps({'type': 'error', 'message': f'Camera {camera_id} not found'}))
+                    return
+                if camera_id not in node.cameras:
+                    await asyncio.wait({closed}, timeout=RELAY_CHECK_SECONDS)  # still being started on its new node
+                    continue
+                try:
+                    async with websockets.connect(f"{node.ws_url}{path}?{query}", max_size=None) as upstream:
+                        await self._pipe(websocket, upstream, closed, camera_id, node)
+                except (websockets.exceptions.WebSocketException, OSError):
+                    await asyncio.wait({closed}, timeout=RELAY_CHECK_SECONDS)
+        finally:
+            closed.cancel()
+
+    async def _pipe(self, websocket: WebSocket, upstream, closed: asyncio.Future, camera_id: str, node: Node):
+        """Forward upstream messages until the client leaves or the camera moves off `node`"""
+        received = None
+        try:
+            while self.owner(camera_id) is node:
+                if received is None:
+                    received = asyncio.ensure_future(upstream.recv())
+                await asyncio.wait({received, closed}, timeout=RELAY_CHECK_SECONDS,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if closed.done():
+                    return
+                if not received.done():
+                    continue
+                message, received = received.result(), None
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+        finally:
+            if received is not None:
+                received.cancel()
+
+
+def spawn_nodes(count: int, base_port: int, state_dir: str):
+    """Start local `backend.main` servers standing in for separate machines. Each runs in its
+    own directory, so photos, clips and the event database are not shared, and without a
+    default camera, since the coordinator assigns every camera."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, 'RTSP_URL': '',
+           'PYTHONPATH': os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')]))}
+    processes = []
+    urls = []
+    for port in range(base_port, base_port + count):
+        workdir = os.path.join(state_dir, f"node-{port}")
+        os.makedirs(workdir, exist_ok=True)
+        processes.append(subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'backend.main:app', '--host', '127.0.0.1', '--port', str(port)],
+            cwd=workdir, env=env))
+        urls.append(f"http://127.0.0.1:{port}")
+        print(f"🚀 Started local node on port {port} (pid {processes[-1].pid})")
+    return processes, urls
+
+
+def stop_processes(processes: List[subprocess.Popen], timeout: float = 10.0):
+    for process in processes:
+        process.terminate()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        try:
+            process.wait(timeout=max(0.1, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+app = FastAPI()
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Nodes from COORDINATOR_NODES (comma-separated URLs) when served with `uvicorn backend.coordinator:app`
+coordinator = Coordinator([url for url in os.environ.get("COORDINATOR_NODES", "").split(",") if url],
+                          default_camera_url=os.environ.get("RTSP_URL", DEFAULT_RTSP_URL) or None)
+
+@app.on_event("startup")
+async def start_coordinator():
+    await coordinator.start()
+
+@app.on_event("shutdown")
+async def stop_coordinator():
+    await coordinator.stop()
+
+@app.get("/")
+async def root():
+    return {"message": "RTSP Object Detection System", "status": "running", "role": "coordinator"}
+
+@app.get("/health")
+async def health_check():
+    return coordinator.health()
+
+@app.get("/api/nodes")
+async def list_nodes():
+    return {"nodes": [node.stats() for node in coordinator.nodes.values()], "assignment": coordinator.assignment()}
+
+@app.post("/api/nodes")
+async def add_node(node_data: dict):
+    url = node_data.get('url')
+    if not url or not url.startswith(('http://', 'https://')):
+        return {"status": "error", "message": "Invalid node data - need an http(s) url"}
+    node = await coordinator.add_node(url)
+    return {"status": "success", "message": f"Node {node.url} added", "node": node.stats()}
+
+@app.delete("/api/nodes")
+async def remove_node(url: str):
+    node = await coordinator.remove_node(url)
+    if node is None:
+        return {"status": "error", "message": f"Node {url} not found"}
+    return {"status": "success", "message": f"Node {node.url} removed", "node": node.stats()}
+
+@app.get("/api/cameras")
+async def list_cameras():
+    running = {camera['id']: camera for camera in coordinator.health()['cameras']}
+    return {"cameras": [running.get(camera_id) or {**spec, 'node': None, 'connected': False}
+                        for camera_id, spec in coordinator.cameras.items()]}
+
+@app.post("/api/cameras")
+async def add_camera(camera_data: dict):
+    if not camera_data.get('id') or not camera_data.get('url'):
+        return {"status": "error", "message": "Invalid camera data - need id and url"}
+    return await coordinator.add_camera(camera_data)
+
+@app.delete("/api/cameras/{camera_id}")
+async def remove_camera(camera_id: str):
+    return await coordinator.remove_camera(camera_id)
+
+@app.post("/api/cameras/{camera_id}/roi")
+async def set_camera_roi(camera_id: str, roi_data: dict):
+    spec = coordinator.cameras.get(camera_id)
+    if spec is None:
+        return {"status": "error", "message": f"Camera {camera_id} not found"}
+    spec['roi_only'] = bool(roi_data.get('enabled', False))
+    return await coordinator.forward(camera_id, 'POST', f"/api/cameras/{quote(camera_id, safe='')}/roi", json=roi_data)
+
+@app.post("/api/zones")
+async def add_zone(zone_data: dict):
+    zone_id = zone_data.get('id')
+    points = zone_data.get('points', [])
+    camera_id = zone_data.get('camera_id', DEFAULT_CAMERA_ID)
+    if camera_id not in coordinator.cameras:
+        return {"status": "error", "message": "Unknown camera"}
+    if not zone_id or len(points) < 3:
+        return {"status": "error", "message": "Invalid zone data - need at least 3 points"}
+    coordinator.zones.setdefault(camera_id, {})[zone_id] = points
+    return await coordinator.forward(camera_id, 'POST', '/api/zones', json={**zone_data, 'camera_id': camera_id})
+
+@app.delete("/api/zones/{zone_id}")
+async def remove_zone(zone_id: str, camera_id: str = DEFAULT_CAMERA_ID):
+    if coordinator.zones.get(camera_id, {}).pop(zone_id, None) is None:
+        return {"status": "error", "message": f"Zone {zone_id} not found"}
+    return await coordinator.forward(camera_id, 'DELETE', f"/api/zones/{quote(zone_id, safe='')}",
+                                     params={'camera_id': camera_id})
+
+@app.get("/api/alerts")
+async def list_alerts(start: Optional[float] = None, end: Optional[float] = None, type: Optional[str] = None,
+                      camera_id: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None):
+    """Stored alert history of every node, newest first; same parameters as a single node"""
+    try:
+        alerts, next_cursor, unavailable = await coordinator.merged_page(
+            '/api/alerts', 'alerts', {'start': start, 'end': end, 'type': type, 'camera_id': camera_id}, cursor, limit)
+        return {"alerts": alerts, "next_cursor": next_cursor, "unavailable_nodes": unavailable}
+    except (ValueError, KeyError) as e:
+        return {"status": "error", "message": f"Invalid cursor: {e}"}
+
+@app.get("/api/photos")
+async def list_photos(start: Optional[float] = None, end: Optional[float] = None, type: Optional[str] = None,
+                      limit: int = 50, cursor: Optional[str] = None):
+    """Captured photos of every node, newest first; each `url` points back through the coordinator"""
+    try:
+        photos, next_cursor, unavailable = await coordinator.merged_page(
+            '/api/photos', 'photos', {'start': start, 'end': end, 'type': type}, cursor, limit)
+    except (ValueError, KeyError) as e:
+        return {"status": "error", "message": f"Invalid cursor: {e}"}
+    for photo in photos:
+        photo['url'] = f"{photo['url']}?node={quote(photo['node'], safe='')}"
+    return {"photos": photos, "next_cursor": next_cursor, "unavailable_nodes": unavailable}
+
+@app.get("/api/photos/{filename}")
+async def get_photo(filename: str, request: Request, node: Optional[str] = None):
+    """A photo (or ?size= thumbnail) from the node that captured it, or the first node that has it"""
+    candidates = [coordinator.nodes[node]] if node in coordinator.nodes else \
+        [candidate for candidate in coordinator.nodes.values() if candidate.healthy]
+    query = {name: value for name, value in request.query_params.items() if name != 'node'}
+    headers = {name: value for name, value in request.headers.items()
+               if name in ('if-none-match', 'if-modified-since')}
+    for candidate in candidates:
+        try:
+            response = await coordinator.client.get(f"{candidate.url}/api/photos/{quote(filename)}",
+                                                    params=query, headers=headers)
+        except httpx.HTTPError:
+            continue
+        if response.status_code != 404:
+            return Response(content=response.content, status_code=response.status_code,
+                            headers={name: response.headers[name] for name in PROXIED_PHOTO_HEADERS
+                                     if name in response.headers})
+    return Response(status_code=404)
+
+@app.websocket("/ws/video")
+async def websocket_video(websocket: WebSocket, camera_id: str = DEFAULT_CAMERA_ID):
+    """Video of the camera relayed from its node; every query parameter is passed through"""
+    await relay_websocket(websocket, '/ws/video', camera_id)
+
+@app.websocket("/ws/detections")
+async def websocket_detections(websocket: WebSocket, camera_id: str = DEFAULT_CAMERA_ID):
+    await relay_websocket(websocket, '/ws/detections', camera_id)
+
+async def relay_websocket(websocket: WebSocket, path: str, camera_id: str):
+    await websocket.accept()
+    print(f"✅ Relaying {path} for {camera_id}")
+    try:
+        await coordinator.relay(websocket, path, camera_id, urlencode(list(websocket.query_params.items())))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"❌ {path} relay error: {e}")
+    finally:
+        print(f"❌ {path} client disconnected")
+        try:
+            await websocket.close()
+        except (RuntimeError, WebSocketDisconnect):
+            pass  # already closed by the client
+
+@app.websocket("/ws/alerts")
+async def websocket_alerts(websocket: WebSocket, camera_id: Optional[str] = None, since: Optional[int] = None,
+                           epoch: Optional[str] = None):
+    """Alerts of every node in one stream, renumbered by the coordinator; each names its `node`"""
+    await websocket.accept()
+    print("✅ Alerts WebSocket client connected")
+    try:
+        await stream_alerts(websocket, coordinator.alert_bus, camera_id, since, epoch)
+    except WebSocketDisconnect:
+        print("❌ Alerts WebSocket client disconnected")
+    except Exception as e:
+        print(f"❌ Alerts WebSocket error: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--node", action="append", dest="nodes", default=[], help="backend node URL (repeatable)")
+    parser.add_argument("--spawn", type=int, default=0, help="start this many local nodes as well")
+    parser.add_argument("--base-port", type=int, default=DEFAULT_BASE_PORT, help="port of the first spawned node")
+    parser.add_argument("--state-dir", help="working directory for spawned nodes (default: a temporary one)")
+    parser.add_argument("--default-camera", default=os.environ.get("RTSP_URL", DEFAULT_RTSP_URL),
+                        help=f"stream registered as camera '{DEFAULT_CAMERA_ID}' ('' for none)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8002)
+    args = parser.parse_args()
+
+    if args.spawn:
+        coordinator.processes, urls = spawn_nodes(args.spawn, args.base_port,
+                                                  args.state_dir or tempfile.mkdtemp(prefix="coordinator-nodes-"))
+        args.nodes.extend(urls)
+    coordinator.seed_nodes.extend(url for url in args.nodes if url not in coordinator.seed_nodes)
+    coordinator.default_camera_url = args.default_camera or None
+
+    import uvicorn
+    try:
+        uvicorn.run(app, host=args.host, port=args.port)
+    finally:
+        # Normally done on shutdown already; this covers startup failures
+        stop_processes(coordinator.processes)
+
+
+if __name__ == "__main__":
+    main()
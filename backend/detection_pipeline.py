@@ -0,0 +1,681 @@
+import json
+import os
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from backend.alerts import AlertBus
+from backend.broadcast import EncodedFrame
+from backend.cameras import CameraRegistry, DEFAULT_CAMERA_ID, DEFAULT_RTSP_URL
+from backend.clips import CLIP_TIER, DEFAULT_CLIPS_DIR
+from backend.colors import HEAD_COVERED_RATIO, TrackColorCache, clothing_color, head_fabric_ratio
+from backend.detections import RECORD_FIELDS, Detections, pairwise_within
+from backend.detectors import create_detector
+from backend.evidence import AlertCooldown, EvidenceWriter
+from backend.inference_pool import InferencePool, SharedMemoryTooSmall, default_workers
+from backend.logs import get_logger
+from backend.metrics import MetricsRegistry, observe_many
+from backend.roi import crop_regions, inference_regions, merge_region_arrays
+from backend.tracker import Tracker
+from backend.workers import MAX_BATCH, InferenceThread
+from backend.zones import ZoneEntries, ZoneView, apply_overlay, foot_points
+
+log = get_logger("backend.frames", rate_limited=True)  # per-frame messages, at most one per template every 10 s
+
+DEFAULT_PHOTOS_DIR = "captured_photos"
+
+WALKING_PIXELS = 20  # per-frame center shift that counts as walking
+CHAIR_MOVED_PIXELS = 25  # displacement over a chair's recent history that counts as moved
+
+PERSON_NEAR_CHAIR_PIXELS = 120
+
+
+def detect_headgear(frame, person_bbox):
+    """Detect if head is covered with cap, hat, hoodie, etc. (NOT just hair)"""
+    fabric_ratio = head_fabric_ratio(frame, person_bbox)
+    if fabric_ratio is None:  # Too small
+        return False
+
+    # If more than 40% of head region has fabric-like colors = covered
+    is_covered = fabric_ratio > HEAD_COVERED_RATIO
+
+    log.debug("Head coverage check: fabric_ratio=%.2f, covered=%s", fabric_ratio, is_covered)
+    return is_covered
+
+
+def detect_clothing_color(frame, person_bbox):
+    """Detect dominant clothing color of person"""
+    return clothing_color(frame, person_bbox)
+
+
+def detect_person_near_chair(person_bbox, chair_bbox):
+    """Check if person is near chair for interaction"""
+    px1, py1, px2, py2 = person_bbox
+    cx1, cy1, cx2, cy2 = chair_bbox
+
+    person_center = ((px1 + px2) // 2, (py1 + py2) // 2)
+    chair_center = ((cx1 + cx2) // 2, (cy1 + cy2) // 2)
+
+    distance = np.sqrt((person_center[0] - chair_center[0])**2 + (person_center[1] - chair_center[1])**2)
+    return distance < PERSON_NEAR_CHAIR_PIXELS
+
+
+def detection_style(detections, i):
+    """Box color and label text for detection `i`"""
+    conf = float(detections.confidences[i])
+    class_name = detections.class_names[i]
+
+    if class_name == 'person':
+        color = (0, 255, 0)  # Green for person
+        label = f"PERSON: {conf:.2f} - {detections.clothing_colors[i] or 'Unknown'}"
+        if detections.is_walking[i]:
+            label += " - WALKING"
+        if detections.zones[i] is not None:
+            color = (0, 0, 255)  # Red for person inside a restricted zone
+            label += f" - IN {detections.zones[i]}"
+    elif class_name == 'chair':
+        if detections.is_moving[i]:
+            color = (0, 255, 255)  # Yellow for moving chair
+            label = f"CHAIR: {conf:.2f} - MOVING"
+        else:
+            color = (255, 0, 0)  # Blue for stationary chair
+            label = f"CHAIR: {conf:.2f} - STATIONARY"
+    else:
+        color = (255, 0, 0)  # Blue for other objects
+        label = f"{class_name}: {conf:.2f}"
+
+    return color, label
+
+
+def draw_detections(frame, detections):
+    """Draw bounding boxes and labels for detections onto the frame"""
+    for i, (x1, y1, x2, y2) in enumerate(detections.boxes.tolist()):
+        color, label = detection_style(detections, i)
+
+        # Draw bounding box
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
+
+        # Draw label with background
+        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+        cv2.rectangle(frame, (x1, y1 - label_size[1] - 10),
+                    (x1 + label_size[0], y1), color, -1)
+        cv2.putText(frame, label, (x1, y1 - 5),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    return frame
+
+
+def draw_zones(frame, zones):
+    """Paint the camera's precompiled zone overlay: one blend however many zones there are"""
+    if not len(zones):
+        return frame
+    return apply_overlay(frame, zones.compiled(frame.shape))
+
+
+class PreparedBatch(NamedTuple):
+    """A batch of captured frames sorted into what needs the model and what does not"""
+    messages: list  # (broadcaster, message) pairs ready now, e.g. stream errors
+    jobs: list  # (camera, captured, zone rects or None, first crop index, crop count)
+    crops: list  # every image going to the detector, in job order
+    carried: list  # (camera, captured) reusing the camera's last detections
+    repeated: list  # (camera, captured) near-duplicates reusing the camera's last rendered messages
+
+
+class DetectionPipeline:
+    """The detection engine: model, cameras, tracking, alerts and evidence, without a web server.
+
+    Creating one has no side effects; `start()` loads the model (unless a
+    detector was passed in), opens the initial camera and starts the
+    inference thread, and `stop()` tears all of it down. Every piece of state
+    lives on the instance, so several pipelines can run in one process; give
+    each its own `photos_dir` (clips go to `clips_dir`, by default a
+    `captured_clips` directory next to it).
+    Frame messages for video/detection clients go to `publish(broadcaster,
+    message)` from the inference thread; the web layer passes a function
+    that hands them to its event loop, and without one they are dropped
+    (the latest annotated frame is still available from
+    `get_current_frame_with_overlays()`).
+
+    With `inference_workers` (default: INFERENCE_WORKERS) above zero, the
+    model runs in that many worker processes instead (see
+    backend/inference_pool.py): the inference thread only prepares and
+    submits batches, and their results are analyzed and published in
+    submission order as they come back. `detector_factory` builds the
+    detector in-process or in each worker; it must be picklable for workers.
+    """
+
+    def __init__(self, rtsp_url: Optional[str] = DEFAULT_RTSP_URL, camera_id: str = DEFAULT_CAMERA_ID,
+                 detector=None, photos_dir: str = DEFAULT_PHOTOS_DIR, clips_dir: Optional[str] = None,
+                 event_store=None,
+                 metrics: Optional[MetricsRegistry] = None, inference_workers: Optional[int] = None,
+                 detector_factory=create_detector, detector_options: Optional[dict] = None):
+        self.rtsp_url = rtsp_url
+        self.camera_id = camera_id
+        self.detector = detector  # inference backend, see backend/detectors.py
+        self.inference_workers = default_workers() if inference_workers is None else inference_workers
+        self.detector_factory = detector_factory
+        self.detector_options = detector_options or {}
+        self._publish = None
+        self.metrics = metrics or MetricsRegistry()
+        self.photos_dir = photos_dir
+        self.clips_dir = clips_dir or os.path.join(os.path.dirname(photos_dir), DEFAULT_CLIPS_DIR)  # next to photos
+        self.cameras = CameraRegistry(self.metrics, self.clips_dir)
+        self.alert_bus = AlertBus()  # sequence-numbered recent alerts, pushed to /ws/alerts subscribers
+        self.event_store = event_store  # optional persistent alert/photo index, see backend/store.py
+        self.evidence = EvidenceWriter(photos_dir, on_saved=event_store.add_evidence if event_store else None,
+                                       on_lost=self.forget_evidence,
+                                       metrics=self.metrics)  # photos are written by background threads
+        self.alert_cooldown = AlertCooldown()  # one alert per movement/intrusion event, not per frame
+        # Tracking state of one-off detect_objects() calls, kept apart from the cameras'
+        # own, which only the thread finishing their batches may touch
+        self.tracker = Tracker()
+        self.colors = TrackColorCache()
+        self.zone_entries = ZoneEntries()
+        self._detect_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._inference_thread: Optional[InferenceThread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._inference_thread is not None
+
+    def start(self, publish=None) -> bool:
+        """Load the model, connect the initial camera and start processing; returns
+        whether the initial camera connected"""
+        with self._lock:
+            if self._inference_thread is not None:
+                return True
+            connected = True
+            try:
+                if self.detector is None and self.inference_workers > 0:
+                    print(f"Starting {self.inference_workers} inference worker processes...")
+                    pool = InferencePool(self.inference_workers, self.detector_factory, self.detector_options,
+                                         max_batch=MAX_BATCH, on_result=self.finish_pooled_batch)
+                    try:
+                        pool.start()
+                        self.detector = pool
+                        print(f"✅ YOLO model loaded in {pool.workers} workers ({pool.backend} backend)")
+                    except SharedMemoryTooSmall as e:
+                        print(f"❌ {e}; running the model in the server process instead")
+                if self.detector is None:
+                    print("Loading YOLO model...")
+                    self.detector = self.detector_factory(**self.detector_options)
+                    print(f"✅ YOLO model loaded ({self.detector.backend} backend)")
+
+                if self.rtsp_url and self.cameras.get(self.camera_id) is None:
+                    print("Connecting to RTSP stream...")
+                    camera = self.cameras.add(self.camera_id, self.rtsp_url)
+                    connected = camera.connected
+                    print("✅ RTSP stream connected" if connected else "❌ RTSP stream failed")
+            except Exception as e:
+                # Keep serving without a model or camera, as the server always has
+                print(f"❌ Initialization error: {e}")
+                connected = False
+
+            if self.event_store is not None:
+                self.event_store.open(backfill_dirs=[('photo', self.photos_dir), ('clip', self.clips_dir)])
+            self._publish = publish or (lambda broadcaster, message: None)
+            process_batch = self.submit_frames if isinstance(self.detector, InferencePool) else self.process_frames
+            self._inference_thread = InferenceThread(self.cameras.frame_sources, self.cameras.ready,
+                                                     process_batch, self._publish, max_batch=MAX_BATCH)
+            self._inference_thread.start()
+            print(f"🎬 Inference worker started for {len(self.cameras)} camera(s)")
+            return connected
+
+    def stop(self):
+        with self._lock:
+            thread, self._inference_thread = self._inference_thread, None
+            if thread is not None:
+                thread.stop()
+                thread.join(timeout=2)
+            if isinstance(self.detector, InferencePool):
+                self.detector.close()
+                self.detector = None
+            self.cameras.close_all()
+            self.evidence.close()
+            if self.event_store is not None:
+                self.event_store.close()
+
+    @property
+    def alerts(self) -> List[dict]:
+        """Recent alerts still held by the alert bus, oldest first"""
+        return self.alert_bus.since(0)[0]
+
+    def get_current_frame_with_overlays(self, camera_id: Optional[str] = None):
+        """Copy of the newest processed frame with boxes and zones drawn, or None before the first one.
+        Frames nobody was watching are drawn here, on demand."""
+        camera = self.cameras.get(camera_id or self.camera_id)
+        latest = camera.latest if camera is not None else None
+        if latest is None:
+            return None
+        frame, detections, annotated = latest
+        if annotated:
+            return frame.copy()
+        return draw_zones(draw_detections(frame.copy(), detections), camera.zones)
+
+    def run_detector(self, frames):
+        """Run the detector once over a batch of frames; returns (boxes, confidences, class ids) per frame"""
+        return self.detector.detect(frames)
+
+    def detect_objects(self, frame, camera_id=DEFAULT_CAMERA_ID):
+        """Detect, track and draw one frame outside the camera loop. Uses the pipeline's own
+        tracker, so it is safe while the camera runs; only the camera's zones are shared."""
+        if self.detector is None:
+            return frame, []
+
+        try:
+            camera = self.cameras.get(camera_id)
+            zones = ZoneView(camera.zones, self.zone_entries) if camera is not None else None
+            with self.metrics.timer('inference', camera_id):
+                results = self.run_detector([frame])
+            with self._detect_lock:
+                frame, detections = self.annotate_detections(frame, results[0], self.tracker, zones, self.colors,
+                                                             camera_id)
+            return frame, detections.to_dicts()
+        except Exception as e:
+            log.error("Detection error: %s", e)
+            return frame, []
+
+    def annotate_detections(self, frame, arrays, tracker, zones=None, colors=None, camera_id=None):
+        """Turn one frame's detector output into detections and draw them onto the frame"""
+        detections = self.analyze_detections(frame, arrays, tracker, zones, colors, camera_id)
+        with self.metrics.timer('draw', camera_id):
+            return draw_detections(frame, detections), detections
+
+    def analyze_detections(self, frame, arrays, tracker, zones=None, colors=None, camera_id=None):
+        """Turn (boxes, confidences, class ids) arrays into tracked Detections with person/chair/zone attributes.
+        Time spent is recorded as the `postprocess` stage, with clothing colors separately as `colors`."""
+        started = time.perf_counter()
+        color_seconds = 0.0
+        try:
+            detections = Detections.from_arrays(*arrays, names=self.detector.name_table)
+            slots = tracker.update(detections.boxes, detections.class_ids)
+            detections.track_ids = tracker.ids[slots]
+            persons = detections.indices_of('person')
+            chairs = detections.indices_of('chair')
+
+            # Enhanced person detection with clothing color, classified again only
+            # when a track's cached color is old or its box changed a lot
+            if colors is None:
+                colors = TrackColorCache()
+            color_started = time.perf_counter()
+            try:
+                person_colors = colors.colors(frame, detections.track_ids[persons], detections.boxes[persons],
+                                              tracker.ids[tracker.active])
+            except Exception as e:
+                log.error("Person detection error: %s", e)
+                person_colors = ["Unknown"] * len(persons)
+            color_seconds = time.perf_counter() - color_started
+            self.metrics.observe('colors', color_seconds, camera_id)
+            for i, color in zip(persons.tolist(), person_colors):
+                detections.clothing_colors[i] = color
+
+            # Walking: center shift since the track's previous frame
+            detections.is_walking[persons] = tracker.step_displacement(slots[persons]) > WALKING_PIXELS
+
+            # Real chair movement: compare the oldest and newest 4 of the last 12
+            # positions so detection-box jitter does not count as movement
+            displacement = tracker.window_displacement(slots[chairs])
+            moved = displacement > CHAIR_MOVED_PIXELS
+            detections.is_moving[chairs] = moved
+            for i, distance in zip(chairs[moved].tolist(), displacement[moved].tolist()):
+                log.info("🪑 CONFIRMED CHAIR MOVEMENT: Chair %d displaced %.1f pixels", detections.track_ids[i], distance)
+
+            # People near each moving chair, as one distance matrix
+            moving_chairs = np.flatnonzero(detections.is_moving)
+            if len(moving_chairs) and len(persons):
+                nearby = pairwise_within(detections.centers[moving_chairs], detections.centers[persons], PERSON_NEAR_CHAIR_PIXELS)
+                for chair, row in zip(moving_chairs.tolist(), nearby):
+                    detections.people_nearby[chair] = persons[row]
+
+            # Zone membership by foot point for every detection in one raster lookup;
+            # persons stepping into a zone become intrusions
+            if zones is not None and len(zones) and len(detections):
+                detections.zones = zones.lookup(foot_points(detections.boxes), frame.shape)
+                detections.entered_zone[persons] = zones.entered(
+                    detections.track_ids[persons], detections.zones[persons], tracker.ids[tracker.active])
+
+            log.debug("🎯 Detected %d objects, %d moving chairs", len(detections), len(moving_chairs))
+            return detections
+
+        except Exception as e:
+            log.error("Detection error: %s", e)
+            return Detections.empty()
+        finally:
+            self.metrics.observe('postprocess', time.perf_counter() - started - color_seconds, camera_id)
+
+    def save_detection_photo(self, frame, alert_type, description):
+        """Queue a photo of the detection for the background evidence writer; returns its path"""
+        return self.evidence.save_photo(frame, alert_type, description)
+
+    def raise_alert(self, alert):
+        """Push an alert to live clients and queue it for the persistent store"""
+        self.metrics.inc('alerts_total', type=alert['type'], camera=alert.get('camera_id'))
+        alert = self.alert_bus.publish(alert)
+        if self.event_store is not None:
+            self.event_store.add_alert(alert)
+
+    def forget_evidence(self, kind, path):
+        """A photo or clip promised to alerts will never be written: stop pointing at it"""
+        self.alert_bus.forget(f'{kind}_path', path)
+        if self.event_store is not None:
+            self.event_store.forget_evidence(kind, path)
+        log.warning("⚠️ %s %s was not written; unlinked from its alerts", kind, path)
+
+    def check_alerts(self, detections, current_frame, camera_id=DEFAULT_CAMERA_ID):
+        camera = self.cameras.get(camera_id)
+
+        def record_clip(alert_type):
+            """Start or extend the camera's pre/post-event clip; returns where it will be saved"""
+            if camera is None:
+                return None
+            return camera.clips.trigger(time.time(), alert_type, self.evidence)
+
+        # Generate alerts for ANY chair movement
+        for i in np.flatnonzero(detections.is_moving).tolist():
+            # Chair movement detected; frames of the same movement do not alert again
+            if not self.alert_cooldown.allow((camera_id, 'chair_moved', int(detections.track_ids[i]))):
+                continue
+            bbox = detections.boxes[i].tolist()
+            confidence = float(detections.confidences[i])
+
+            # Check if person is nearby for context
+            people_nearby = detections.people_nearby.get(i, ())
+            person_clothing = "Unknown"
+            if len(people_nearby):
+                person_clothing = detections.clothing_colors[people_nearby[0]] or "Unknown"
+
+            # Save photo of the detection
+            description = f"Chair moved - Person nearby: {person_clothing if len(people_nearby) else 'None'}"
+            photo_path = self.save_detection_photo(current_frame, "chair_moved", description)
+            clip_path = record_clip("chair_moved")
+
+            self.raise_alert({
+                'type': 'chair_moved',
+                'camera_id': camera_id,
+                'track_id': int(detections.track_ids[i]),
+                'timestamp': float(time.time()),
+                'bbox': bbox,
+                'confidence': confidence,
+                'message': f'🪑 CHAIR MOVED: {person_clothing + " nearby" if len(people_nearby) else "No person visible"}',
+                'photo_path': photo_path,
+                'clip_path': clip_path
+            })
+            print(f"✅ CHAIR MOVED + PHOTO: {person_clothing + ' nearby' if len(people_nearby) else 'No person visible'}")
+
+        # Person stepping into a restricted zone
+        for i in np.flatnonzero(detections.entered_zone).tolist():
+            zone_id = detections.zones[i]
+            if not self.alert_cooldown.allow((camera_id, 'zone_intrusion', int(detections.track_ids[i]), zone_id)):
+                continue
+            clothing = detections.clothing_colors[i] or "Unknown"
+            photo_path = self.save_detection_photo(current_frame, "zone_intrusion", f"Person entered zone {zone_id} - Clothing: {clothing}")
+            clip_path = record_clip("zone_intrusion")
+
+            self.raise_alert({
+                'type': 'zone_intrusion',
+                'camera_id': camera_id,
+                'track_id': int(detections.track_ids[i]),
+                'zone_id': zone_id,
+                'timestamp': float(time.time()),
+                'bbox': detections.boxes[i].tolist(),
+                'confidence': float(detections.confidences[i]),
+                'message': f'🚫 ZONE INTRUSION: {clothing} person in {zone_id}',
+                'photo_path': photo_path,
+                'clip_path': clip_path
+            })
+            print(f"✅ ZONE INTRUSION + PHOTO: {clothing} person in {zone_id}")
+
+    def process_frames(self, batch):
+        """Detect and encode a batch of (camera, captured) pairs with a single model call.
+
+        Frames the camera's motion gate considers static skip the model and reuse
+        that camera's last detections; near-duplicate frames also skip drawing and
+        encoding. Returns (broadcaster, message) pairs.
+        """
+        prepared = self.prepare_batch(batch)
+        results = None
+        if self.detector is not None and prepared.crops:
+            started = time.perf_counter()
+            try:
+                results = self.run_detector(prepared.crops)
+            except Exception as e:
+                log.error("Detection error: %s", e)
+            self.observe_inference(prepared, time.perf_counter() - started)
+        return prepared.messages + self.finish_batch(prepared, results)
+
+    def submit_frames(self, batch):
+        """Worker-pool counterpart of process_frames: hand the batch's crops to the pool and
+        return only the messages that are ready now; the rest follow in finish_pooled_batch"""
+        prepared = self.prepare_batch(batch)
+        # Batches without crops still go through the pool to keep each camera's frames in order
+        self.detector.submit(prepared.crops, prepared)
+        return prepared.messages
+
+    def finish_pooled_batch(self, prepared, results, seconds):
+        """Called by the inference pool, in submission order, with one batch's detector output"""
+        if prepared.crops:
+            self.observe_inference(prepared, seconds)
+        for broadcaster, message in self.finish_batch(prepared, results):
+            if message is not None:
+                self._publish(broadcaster, message)
+        for camera, captured in [job[:2] for job in prepared.jobs] + prepared.carried + prepared.repeated:
+            camera.frames.record_latency(captured)
+
+    def observe_inference(self, prepared, seconds):
+        # One batched call serves every camera in it; each is charged the whole call
+        observe_many(self.metrics, 'inference', seconds, {job[0].id for job in prepared.jobs})
+
+    def prepare_batch(self, batch) -> PreparedBatch:
+        """Sort (camera, captured) pairs into error messages, frames for the model, frames
+        the motion gate lets reuse earlier detections and near-duplicates of the last frame"""
+        messages = []
+        to_detect = []
+        carried = []
+        repeated = []
+        for camera, captured in batch:
+            if not captured.ok:
+                error = json.dumps({
+                    'type': 'error',
+                    'message': captured.payload
+                })
+                messages.extend((broadcaster, error) for broadcaster in camera.broadcasters)
+            elif camera.duplicates.is_duplicate(captured.payload, camera.zones.version):
+                repeated.append((camera, captured))
+            elif camera.motion.should_run(captured.payload):
+                to_detect.append((camera, captured))
+            else:
+                carried.append((camera, captured))
+
+        # Cameras in ROI mode contribute one crop per merged zone rectangle instead
+        # of the full frame; every crop of every camera goes into one model call
+        crops = []
+        jobs = []
+        for camera, captured in to_detect:
+            frame = captured.payload
+            rects = inference_regions(camera.zones, frame.shape) if camera.roi_only else None
+            if rects is None:
+                jobs.append((camera, captured, None, len(crops), 1))
+                crops.append(frame)
+            else:
+                jobs.append((camera, captured, rects, len(crops), len(rects)))
+                crops.extend(crop_regions(frame, rects))
+        return PreparedBatch(messages, jobs, crops, carried, repeated)
+
+    def finish_batch(self, prepared, results):
+        """Analyze, draw, encode and alert on a prepared batch given the detector's output
+        (None if it failed). Returns (broadcaster, message) pairs."""
+        messages = []
+        for camera, captured, rects, start, count in prepared.jobs:
+            try:
+                if results is None:
+                    arrays = None
+                elif rects is None:
+                    arrays = results[start]
+                else:
+                    arrays = merge_region_arrays(results[start:start + count], rects)
+                if arrays is None:
+                    # Don't let later duplicates of this frame inherit the missing detections
+                    camera.duplicates.reset()
+                detections = Detections.empty() if arrays is None else self.analyze_detections(
+                    captured.payload, arrays, camera.tracker, camera.zones, camera.colors, camera.id)
+                camera.last_detections = detections
+                messages.extend(self.render_frame(camera, captured, detections, fresh=True))
+                self.metrics.observe('total', time.time() - captured.captured_at, camera.id)
+            except Exception as e:
+                camera.duplicates.reset()
+                log.error("❌ Frame processing error on %s: %s", camera.id, e)
+
+        for camera, captured in prepared.carried:
+            try:
+                messages.extend(self.render_frame(camera, captured, camera.last_detections, fresh=False))
+                self.metrics.observe('total', time.time() - captured.captured_at, camera.id)
+            except Exception as e:
+                camera.duplicates.reset()
+                log.error("❌ Frame processing error on %s: %s", camera.id, e)
+
+        for camera, captured in prepared.repeated:
+            try:
+                if self.can_repeat(camera):
+                    messages.extend(self.repeat_frame(camera, captured))
+                else:
+                    messages.extend(self.render_frame(camera, captured, camera.last_detections, fresh=False))
+                self.metrics.observe('total', time.time() - captured.captured_at, camera.id)
+            except Exception as e:
+                camera.duplicates.reset()
+                log.error("❌ Frame processing error on %s: %s", camera.id, e)
+        return messages
+
+    def can_repeat(self, camera) -> bool:
+        """Whether the last full render left a message for every output that wants one now"""
+        wanted = [broadcaster for broadcaster in camera.broadcasters if broadcaster.subscriber_count]
+        if camera.clips.wants_frames:
+            wanted.append(camera.broadcaster)
+        return camera.latest is not None and all(broadcaster in camera.rendered for broadcaster in wanted)
+
+    def repeat_frame(self, camera, captured):
+        """Messages for a near-duplicate frame: the last rendered ones, unchanged.
+
+        Nothing is drawn or encoded and the very same message objects are
+        published again, so subscribers that already hold them skip the send
+        (see Subscriber.offer). The clip buffer gets the previous JPEG bytes
+        under the new timestamp so clips keep their frame rate.
+        """
+        if camera.clips.wants_frames:
+            encoded = camera.rendered[camera.broadcaster]
+            camera.clips.add(captured.captured_at, encoded.jpeg(CLIP_TIER), *encoded.size(CLIP_TIER))
+        return [(broadcaster, message) for broadcaster, message in camera.rendered.items()
+                if broadcaster.subscriber_count]
+
+    def render_frame(self, camera, captured, detections, fresh):
+        """Build one frame's messages: detection records, raw video and annotated video.
+
+        Each output is only drawn and encoded while it has subscribers (or, for the
+        annotated frame, while an alert fires or the camera's clip buffer wants frames),
+        so an idle camera watched only through /ws/detections never draws or encodes.
+        `fresh` is False when the detections were carried forward from an earlier
+        frame, in which case no new alerts are raised.
+        """
+        frame = captured.payload
+        meta = {
+            'camera_id': camera.id,
+            'detections': len(detections),
+            'zones': len(camera.zones),
+            'inference_skipped': not fresh,
+            'seq': captured.seq,
+            'captured_at': captured.captured_at,
+            'latency_ms': round((time.time() - captured.captured_at) * 1000, 1)
+        }
+        messages = []
+        camera.rendered = rendered = {}
+
+        if camera.detection_broadcaster.subscriber_count:
+            height, width = frame.shape[:2]
+            rendered[camera.detection_broadcaster] = json.dumps({
+                'type': 'detections',
+                **meta,
+                'width': width,
+                'height': height,
+                'fields': RECORD_FIELDS,
+                'records': detections.to_records(),
+            })
+            messages.append((camera.detection_broadcaster, rendered[camera.detection_broadcaster]))
+
+        # Alert photos and clips carry the overlays, so draw for them too
+        alerting = fresh and bool(detections.is_moving.any() or detections.entered_zone.any())
+        annotate = camera.broadcaster.subscriber_count or alerting or camera.clips.wants_frames
+
+        if camera.raw_broadcaster.subscriber_count:
+            raw = EncodedFrame(frame.copy() if annotate else frame, dict(meta))
+            with self.metrics.timer('encode', camera.id):
+                raw.prepare(camera.raw_broadcaster.active_tiers())
+            rendered[camera.raw_broadcaster] = raw
+            messages.append((camera.raw_broadcaster, raw))
+
+        if fresh and len(detections):
+            log.debug("🎯 Frame processed with %d detections", len(detections))
+        if not annotate:
+            camera.latest = (frame, detections, False)
+            return messages
+
+        with self.metrics.timer('draw', camera.id):
+            # Draw bounding boxes for this camera's detections
+            frame_with_detections = draw_detections(frame, detections)
+
+            # Draw zones if any
+            frame_with_detections = draw_zones(frame_with_detections, camera.zones)
+        camera.latest = (frame_with_detections, detections, True)
+
+        # Generate alerts with photo capture
+        if alerting:
+            self.check_alerts(detections, frame_with_detections, camera.id)
+
+        viewers = camera.broadcaster.subscriber_count
+        recording = camera.clips.wants_frames  # after check_alerts, so a clip starts with its event
+        if viewers or recording:
+            # Downscale and JPEG-encode only at the quality tiers current viewers and
+            # the clip buffer use; everyone at the same tier shares one encode
+            encoded = EncodedFrame(frame_with_detections, meta)
+            with self.metrics.timer('encode', camera.id):
+                encoded.prepare(camera.broadcaster.active_tiers() | ({CLIP_TIER} if recording else set()))
+            rendered[camera.broadcaster] = encoded
+            if recording:
+                camera.clips.add(captured.captured_at, encoded.jpeg(CLIP_TIER), *encoded.size(CLIP_TIER))
+            if viewers:
+                messages.append((camera.broadcaster, encoded))
+        return messages
+
+    def collect_metrics(self):
+        """Copy counters owned by cameras, broadcasters and the evidence writer into the registry"""
+        metrics = self.metrics
+        metrics.clear('clients')
+        for camera in self.cameras.all():
+            frames = camera.frames.stats()
+            metrics.set('frames_captured_total', frames['frames_captured'], camera=camera.id)
+            metrics.set('frames_dropped_total', frames['frames_dropped'], camera=camera.id)
+            metrics.set('inferences_skipped_total', camera.motion.stats()['inferences_skipped'], camera=camera.id)
+            metrics.set('frames_duplicate_total', camera.duplicates.duplicates, camera=camera.id)
+            metrics.set('sends_skipped_total', sum(broadcaster.sends_skipped for broadcaster in camera.broadcasters),
+                        camera=camera.id)
+            for stream, broadcaster in zip(('video', 'raw', 'detections'), camera.broadcasters):
+                metrics.set('clients', broadcaster.subscriber_count, camera=camera.id, stream=stream)
+        metrics.set('clients', self.alert_bus.subscriber_count, stream='alerts')
+        metrics.set('evidence_dropped_total', self.evidence.dropped)
+        return metrics
+
+    def stats(self) -> dict:
+        return {
+            "model_loaded": self.detector is not None,
+            "detector_backend": self.detector.backend if self.detector is not None else None,
+            "rtsp_connected": any(camera.connected for camera in self.cameras.all()),
+            "cameras": [camera.stats() for camera in self.cameras.all()],
+            "zones_count": sum(len(camera.zones) for camera in self.cameras.all()),
+            "alerts_count": len(self.alert_bus),
+            "latest_alert_seq": self.alert_bus.latest_seq,
+            "evidence_writer": self.evidence.stats(),
+            "inference_pool": self.detector.stats() if isinstance(self.detector, InferencePool) else None,
+            "latency_ms": self.metrics.percentiles()
+        }
@@ -0,0 +1,128 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# Compact per-detection records for the metadata-only /ws/detections channel
+RECORD_FIELDS = ('track_id', 'class', 'x1', 'y1', 'x2', 'y2', 'confidence', 'flags', 'color', 'zone')
+RECORD_WALKING = 0x01
+RECORD_MOVING = 0x02
+RECORD_ENTERED_ZONE = 0x04
+
+
+def empty_arrays():
+    return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+
+
+def result_arrays(result):
+    """Pull (boxes Nx4 xyxy, confidences N, class ids N) out of an Ultralytics result"""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return empty_arrays()
+    return (
+        boxes.xyxy.cpu().numpy().astype(np.float32),
+        boxes.conf.cpu().numpy().astype(np.float32),
+        boxes.cls.cpu().numpy().astype(np.int64),
+    )
+
+
+def name_table(names: Dict[int, str]) -> np.ndarray:
+    """Class-id -> name lookup array so a whole frame's labels come from one fancy index"""
+    size = max(names) + 1 if names else 0
+    return np.array([names.get(i, str(i)) for i in range(size)], dtype=object)
+
+
+@dataclass
+class Detections:
+    """One frame's detections as parallel arrays.
+
+    Analysis, drawing and alerting index into these arrays; per-detection
+    dicts are only built by `to_dicts()` when results leave the pipeline.
+    """
+
+    boxes: np.ndarray  # (N, 4) int32 xyxy
+    confidences: np.ndarray  # (N,) float32
+    class_ids: np.ndarray  # (N,) int64
+    class_names: np.ndarray  # (N,) object
+    centers: np.ndarray  # (N, 2) int32
+    is_walking: np.ndarray  # (N,) bool, persons only
+    is_moving: np.ndarray  # (N,) bool, chairs only
+    clothing_colors: List[Optional[str]]  # persons only, None elsewhere
+    track_ids: np.ndarray  # (N,) int64, -1 when untracked
+    zones: np.ndarray  # (N,) object, zone id under the box's foot point or None
+    entered_zone: np.ndarray  # (N,) bool, persons who stepped into their zone this frame
+    people_nearby: Dict[int, np.ndarray] = field(default_factory=dict)  # moving chair index -> person indices
+
+    @classmethod
+    def from_arrays(cls, boxes, confidences, class_ids, names: np.ndarray) -> "Detections":
+        boxes = boxes.astype(np.int32)
+        count = len(boxes)
+        known = class_ids < len(names)
+        class_names = np.empty(count, dtype=object)
+        class_names[known] = names[class_ids[known]]
+        class_names[~known] = class_ids[~known].astype(str)
+        return cls(
+            boxes=boxes,
+            confidences=confidences.astype(np.float32),
+            class_ids=class_ids.astype(np.int64),
+            class_names=class_names,
+            centers=(boxes[:, :2] + boxes[:, 2:]) // 2,
+            is_walking=np.zeros(count, bool),
+            is_moving=np.zeros(count, bool),
+            clothing_colors=[None] * count,
+            track_ids=np.full(count, -1, np.int64),
+            zones=np.full(count, None, dtype=object),
+            entered_zone=np.zeros(count, bool),
+        )
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls.from_arrays(*empty_arrays(), names=np.empty(0, dtype=object))
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def indices_of(self, class_name: str) -> np.ndarray:
+        return np.flatnonzero(self.class_names == class_name)
+
+    def to_dict(self, i: int) -> dict:
+        class_name = self.class_names[i]
+        detection = {
+            'bbox': self.boxes[i].tolist(),
+            'confidence': float(self.confidences[i]),
+            'class': int(self.class_ids[i]),
+            'class_name': class_name,
+            'center': tuple(self.centers[i].tolist()),
+            'track_id': int(self.track_ids[i]),
+            'zone': self.zones[i],
+        }
+        if class_name == 'person':
+            detection['clothing_color'] = self.clothing_colors[i] or "Unknown"
+            detection['is_walking'] = bool(self.is_walking[i])
+        elif class_name == 'chair':
+            detection['is_moving'] = bool(self.is_moving[i])
+            if i in self.people_nearby:
+                detection['people_nearby'] = [self.to_dict(int(p)) for p in self.people_nearby[i]]
+        return detection
+
+    def to_dicts(self) -> List[dict]:
+        return [self.to_dict(i) for i in range(len(self))]
+
+    def to_records(self) -> List[list]:
+        """One flat row per detection in RECORD_FIELDS order"""
+        flags = ((self.is_walking * RECORD_WALKING) | (self.is_moving * RECORD_MOVING)
+                 | (self.entered_zone * RECORD_ENTERED_ZONE))
+        return [
+            [track_id, class_name, *box, confidence, flag, color, zone]
+            for track_id, class_name, box, confidence, flag, color, zone in zip(
+                self.track_ids.tolist(), self.class_names.tolist(), self.boxes.tolist(),
+                self.confidences.astype(np.float64).round(3).tolist(), flags.tolist(),
+                self.clothing_colors, self.zones.tolist())
+        ]
+
+
+def pairwise_within(a: np.ndarray, b: np.ndarray, distance: float) -> np.ndarray:
+    """(len(a), len(b)) mask of point pairs closer than `distance`"""
+    diff = a[:, None, :].astype(np.float32) - b[None, :, :].astype(np.float32)
+    return np.einsum('ijk,ijk->ij', diff, diff) < distance * distance
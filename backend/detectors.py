@@ -0,0 +1,231 @@
+import ast
+import logging
+import os
+from functools import cached_property
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from backend.detections import empty_arrays, name_table, result_arrays
+from backend.logs import get_logger
+
+DEFAULT_BACKEND = "ultralytics"
+DEFAULT_IOU = 0.7  # Ultralytics' own NMS default, which the server used before backends were pluggable
+DEFAULT_WEIGHTS = {
+    "ultralytics": "yolov8n.pt",
+    "onnx": "yolov8n.onnx",
+    "openvino": "yolov8n_int8_openvino_model",
+}
+
+log = get_logger("backend.frames", rate_limited=True)
+
+
+class Detector:
+    """Common interface for inference backends.
+
+    `detect(frames)` takes a list of BGR frames and returns one
+    `(boxes Nx4 xyxy, confidences N, class ids N)` tuple per frame, in
+    full-frame pixel coordinates. `names` maps class ids to labels.
+    """
+
+    backend = None
+
+    def __init__(self, conf: float = 0.5, iou: float = DEFAULT_IOU):
+        self.conf = conf
+        self.iou = iou
+        self.names = {}
+
+    def detect(self, frames):
+        raise NotImplementedError
+
+    @cached_property
+    def name_table(self):
+        return name_table(self.names)
+
+
+class UltralyticsDetector(Detector):
+    """PyTorch eager inference through Ultralytics; pre/post-processing done by the library"""
+
+    backend = "ultralytics"
+
+    def __init__(self, weights: str = DEFAULT_WEIGHTS["ultralytics"], conf: float = 0.5, iou: float = DEFAULT_IOU):
+        super().__init__(conf, iou)
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.names = self.model.names
+
+    def detect(self, frames):
+        # verbose=False: Ultralytics otherwise prints a summary line per frame on the hot path
+        results = self.model(frames, conf=self.conf, iou=self.iou, verbose=False)
+        speed = getattr(results[0], "speed", None) if results and log.isEnabledFor(logging.DEBUG) else None
+        if speed:
+            log.debug("🔍 Ultralytics batch of %d: %s", len(frames),
+                      ", ".join(f"{stage} {ms:.1f} ms" for stage, ms in speed.items()))
+        return [result_arrays(result) for result in results]
+
+
+def letterbox(frame, size: int):
+    """Resize keeping aspect ratio and pad to a square; returns image, scale and (pad_x, pad_y)"""
+    height, width = frame.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), 114, np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    return canvas, scale, (pad_x, pad_y)
+
+
+def to_blob(images):
+    """Stack letterboxed BGR images into an NCHW float32 RGB batch in [0, 1]"""
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+def decode_yolov8(output, scale, pad, frame_shape, conf, iou):
+    """Decode one raw YOLOv8 head output (4 + classes, anchors) with class-aware NMS"""
+    preds = output.T
+    scores = preds[:, 4:]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+    keep = confidences >= conf
+    if not keep.any():
+        return empty_arrays()
+
+    xywh, confidences, class_ids = preds[keep, :4], confidences[keep], class_ids[keep]
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    boxes -= np.array([pad[0], pad[1], pad[0], pad[1]], np.float32)
+    boxes /= scale
+    height, width = frame_shape[:2]
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+
+    rects = np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]]).tolist()
+    indices = cv2.dnn.NMSBoxesBatched(rects, confidences.tolist(), class_ids.tolist(), conf, iou)
+    indices = np.asarray(indices, np.int64).reshape(-1)
+    return boxes[indices].astype(np.float32), confidences[indices].astype(np.float32), class_ids[indices].astype(np.int64)
+
+
+class ExportedYoloDetector(Detector):
+    """Shared letterbox preprocessing and YOLOv8 decoding/NMS for exported graphs"""
+
+    def __init__(self, conf: float = 0.5, iou: float = DEFAULT_IOU, imgsz: int = 640):
+        super().__init__(conf, iou)
+        self.imgsz = imgsz
+        self.batch_size = None  # None = any batch size accepted
+
+    def infer(self, blob):
+        raise NotImplementedError
+
+    def detect(self, frames):
+        prepared = [letterbox(frame, self.imgsz) for frame in frames]
+        step = self.batch_size or len(prepared)
+        outputs = []
+        for start in range(0, len(prepared), step):
+            outputs.extend(self.infer(to_blob([image for image, _, _ in prepared[start:start + step]])))
+        return [
+            decode_yolov8(output, scale, pad, frame.shape, self.conf, self.iou)
+            for output, (_, scale, pad), frame in zip(outputs, prepared, frames)
+        ]
+
+
+class OnnxDetector(ExportedYoloDetector):
+    """ONNX Runtime session over a `yolo export format=onnx` graph"""
+
+    backend = "onnx"
+
+    def __init__(self, weights: str = DEFAULT_WEIGHTS["onnx"], conf: float = 0.5, iou: float = DEFAULT_IOU, imgsz: int = 640):
+        super().__init__(conf, iou, imgsz)
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx detector backend requires onnxruntime (pip install onnxruntime)") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(weights, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        if isinstance(model_input.shape[0], int):
+            self.batch_size = model_input.shape[0]
+        if isinstance(model_input.shape[2], int):
+            self.imgsz = model_input.shape[2]
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = parse_names(metadata.get("names"))
+
+    def infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoDetector(ExportedYoloDetector):
+    """OpenVINO CPU inference over a `yolo export format=openvino [int8=True]` model directory"""
+
+    backend = "openvino"
+
+    def __init__(self, weights: str = DEFAULT_WEIGHTS["openvino"], conf: float = 0.5, iou: float = DEFAULT_IOU, imgsz: int = 640):
+        super().__init__(conf, iou, imgsz)
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise ImportError("The openvino detector backend requires openvino (pip install openvino)") from e
+
+        path = Path(weights)
+        xml_path = next(path.glob("*.xml")) if path.is_dir() else path
+        core = ov.Core()
+        model = core.read_model(str(xml_path))
+        input_shape = model.inputs[0].get_partial_shape()
+        if input_shape[0].is_static:
+            self.batch_size = input_shape[0].get_length()
+        if input_shape[2].is_static:
+            self.imgsz = input_shape[2].get_length()
+        self.compiled = core.compile_model(model, "CPU", {"PERFORMANCE_HINT": "THROUGHPUT"})
+        self.output = self.compiled.output(0)
+        self.names = load_metadata_names(xml_path.parent / "metadata.yaml")
+
+    def infer(self, blob):
+        return self.compiled(blob)[self.output]
+
+
+def parse_names(raw):
+    """Class names as stored in Ultralytics export metadata (a dict literal string)"""
+    if not raw:
+        return {}
+    names = ast.literal_eval(raw) if isinstance(raw, str) else raw
+    return {int(k): v for k, v in names.items()}
+
+
+def load_metadata_names(path):
+    if not Path(path).exists():
+        return {}
+    import yaml
+    with open(path) as f:
+        return parse_names((yaml.safe_load(f) or {}).get("names"))
+
+
+BACKENDS = {
+    "ultralytics": UltralyticsDetector,
+    "onnx": OnnxDetector,
+    "openvino": OpenVinoDetector,
+}
+
+
+def create_detector(backend: str = None, weights: str = None, conf: float = 0.5) -> Detector:
+    """Build the configured backend; defaults come from DETECTOR_BACKEND / DETECTOR_WEIGHTS"""
+    backend = backend or os.environ.get("DETECTOR_BACKEND", DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend {backend!r}; choose one of {', '.join(BACKENDS)}")
+    weights = weights or os.environ.get("DETECTOR_WEIGHTS") or DEFAULT_WEIGHTS[backend]
+    return BACKENDS[backend](weights, conf=conf)
+
+
+def export_weights(weights: str, backend: str, imgsz: int = 640) -> str:
+    """Export PyTorch weights for an exported backend through Ultralytics; returns the new path"""
+    from ultralytics import YOLO
+    model = YOLO(weights)
+    if backend == "onnx":
+        return model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    if backend == "openvino":
+        return model.export(format="openvino", imgsz=imgsz, int8=True)
+    raise ValueError(f"Backend {backend!r} does not need an export step")
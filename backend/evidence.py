@@ -0,0 +1,183 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional
+
+import cv2
+
+DEFAULT_ALERT_COOLDOWN_SECONDS = 10.0
+
+
+class AlertCooldown:
+    """Debounce alerts per key (camera, alert type, track).
+
+    A key fires on its first sighting and then stays quiet for as long as it
+    keeps being seen; only after `seconds` without a sighting can it fire
+    again. One continuous chair movement therefore raises one alert.
+    """
+
+    def __init__(self, seconds: float = DEFAULT_ALERT_COOLDOWN_SECONDS):
+        self.seconds = seconds
+        self._last_seen: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def allow(self, key: Hashable, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last = self._last_seen.get(key)
+            self._last_seen[key] = now
+            if len(self._last_seen) > 1024:
+                self._last_seen = {k: t for k, t in self._last_seen.items() if now - t <= self.seconds}
+                self._last_seen[key] = now
+            if last is not None and now - last <= self.seconds:
+                self.suppressed += 1
+                return False
+            return True
+
+
+def annotate_photo(frame, alert_type: str, description: str, when: datetime):
+    """Copy of the frame with the detection info burnt in"""
+    overlay_frame = frame.copy()
+    text_lines = [
+        f"DETECTION: {description}",
+        f"TIME: {when.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"ALERT: {alert_type.upper()}"
+    ]
+    y_offset = 30
+    for line in text_lines:
+        cv2.putText(overlay_frame, line, (10, y_offset),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        y_offset += 30
+    return overlay_frame
+
+
+def write_exclusive(path: str, data: bytes):
+    """Write a new file, refusing to overwrite an existing one"""
+    with open(path, 'xb') as f:
+        f.write(data)
+
+
+class EvidenceWriter:
+    """Background pool that writes alert evidence off the frame loop.
+
+    Jobs go into a bounded queue drained by `workers` daemon threads, started
+    on first use. When the queue is full the job is dropped and counted
+    rather than blocking the caller, so an event storm cannot stall
+    inference. Filenames carry microseconds and a sequence number, so they
+    never collide. Each file written is reported to `on_saved(kind, path,
+    alert_type, timestamp, size)`, and each promised file that will never
+    exist (dropped or failed write) to `on_lost(kind, path)`, if set.
+    """
+
+    def __init__(self, directory: str, workers: int = 2, queue_size: int = 64,
+                 on_saved: Optional[Callable[[str, str, Optional[str], float, int], None]] = None,
+                 on_lost: Optional[Callable[[str, str], None]] = None, metrics=None):
+        self.directory = directory
+        self.workers = workers
+        self.on_saved = on_saved
+        self.on_lost = on_lost
+        self.metrics = metrics
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"evidence-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job, kind, path = item
+            try:
+                job()
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Error writing evidence: {e}")
+                self.lost(kind, path)
+
+    def new_path(self, prefix: str, extension: str, when: Optional[datetime] = None,
+                 directory: Optional[str] = None) -> str:
+        when = when or datetime.now()
+        filename = f"{prefix}_{when.strftime('%Y%m%d_%H%M%S_%f')}_{next(self._sequence):06d}.{extension}"
+        return os.path.join(directory or self.directory, filename)
+
+    def submit(self, job: Callable[[], None], kind: Optional[str] = None, path: Optional[str] = None) -> bool:
+        """Queue a write of the `kind` file at `path`; returns False (and counts a drop) if the
+        pool is saturated. A write that is dropped or fails is reported to on_lost."""
+        self._start()
+        try:
+            self._queue.put_nowait((job, kind, path))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self.lost(kind, path)
+            return False
+
+    def saved(self, kind: str, path: str, alert_type: Optional[str], timestamp: float, size: int):
+        if self.on_saved is not None:
+            self.on_saved(kind, path, alert_type, timestamp, size)
+
+    def lost(self, kind: Optional[str], path: Optional[str]):
+        if self.on_lost is not None and path is not None:
+            self.on_lost(kind, path)
+
+    def save_photo(self, frame, alert_type: str, description: str) -> Optional[str]:
+        """Queue an annotated JPEG of `frame`; returns the path it will be written to.
+
+        The frame must not be modified afterwards: it is annotated and
+        encoded by the worker, not copied here.
+        """
+        when = datetime.now()
+        path = self.new_path(alert_type, 'jpg', when)
+
+        def write():
+            started = time.perf_counter()
+            os.makedirs(self.directory, exist_ok=True)
+            ok, buffer = cv2.imencode('.jpg', annotate_photo(frame, alert_type, description, when))
+            if not ok:
+                raise RuntimeError(f"could not encode {path}")
+            write_exclusive(path, buffer.tobytes())
+            self.saved('photo', path, alert_type, when.timestamp(), len(buffer))
+            if self.metrics is not None:
+                self.metrics.observe('photo_write', time.perf_counter() - started)
+            print(f"📸 PHOTO SAVED: {path}")
+
+        if not self.submit(write, 'photo', path):
+            if self.dropped == 1 or self.dropped % 50 == 0:
+                print(f"❌ Evidence queue full, {self.dropped} writes dropped so far")
+            return None
+        return path
+
+    def close(self, timeout: float = 5.0):
+        """Let queued writes finish, then stop the workers"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
@@ -0,0 +1,337 @@
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from backend.detectors import Detector, create_detector
+from backend.logs import get_logger
+from backend.workers import MAX_BATCH
+
+log = get_logger(__name__)
+
+DEFAULT_FRAME_BYTES = 1920 * 1080 * 3  # one 1080p BGR frame
+TASKS_PER_WORKER = 2  # batches queued or running per worker before submit() blocks
+READY_TIMEOUT = 300.0  # seconds for every worker to load its model
+TASK_TIMEOUT = 10.0  # a batch not back by then (its worker died or hangs) is delivered as failed
+SHM_DIR = "/dev/shm"  # where Linux keeps shared memory; Docker caps it at 64 MB unless run with --shm-size
+
+
+def default_workers() -> int:
+    """INFERENCE_WORKERS, or 0 to run the detector in the server process"""
+    return int(os.environ.get("INFERENCE_WORKERS", "0"))
+
+
+def shm_free_bytes() -> Optional[int]:
+    """Space left for shared-memory segments, or None where it cannot be measured"""
+    if not os.path.isdir(SHM_DIR):
+        return None
+    return shutil.disk_usage(SHM_DIR).free
+
+
+class SharedMemoryTooSmall(RuntimeError):
+    """The pool's segment does not fit in /dev/shm; writing to it would crash with SIGBUS"""
+
+    def __init__(self, needed: int, free: int):
+        super().__init__(f"inference pool needs {needed / 2 ** 20:.0f} MB of shared memory but "
+                         f"{SHM_DIR} has {free / 2 ** 20:.0f} MB free (run Docker with a larger --shm-size)")
+        self.needed = needed
+        self.free = free
+
+
+def worker_main(index, busy, shm_name, tasks, results, detector_factory, factory_kwargs):
+    """Inference process: build a detector, then run batches whose frames sit in shared memory.
+    `busy[index]` holds the sequence number of the batch this worker took last."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        detector = detector_factory(**factory_kwargs)
+        results.put(('ready', os.getpid(), detector.backend, detector.names))
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, frames = task  # [(offset, shape) or (None, pickled frame)]
+            busy[index] = seq
+            images = [np.ndarray(item, np.uint8, buffer=shm.buf, offset=offset) if offset is not None
+                      else item for offset, item in frames]
+            started = time.perf_counter()
+            try:
+                output = detector.detect(images)
+                results.put(('done', seq, output, time.perf_counter() - started, None))
+            except Exception as e:
+                results.put(('done', seq, None, time.perf_counter() - started, str(e)))
+            # Views into the segment must be gone before it can be closed
+            del images
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shm.close()
+
+
+class SyncCall:
+    """A detect() caller waiting for its batch to come out of the pool"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.output = None
+        self.error = None
+
+
+class InferencePool(Detector):
+    """Detector replicas in separate processes, so inference uses more than one core.
+
+    Every batch in flight owns one region of a shared-memory segment, big
+    enough for `max_batch` frames of up to `frame_bytes` each; its frames
+    (or ROI crops) are copied in back to back and workers read them in
+    place, so only offsets and shapes cross the process boundary. Only
+    frames that do not fit (larger than 1080p) are pickled. Batches are handed out in submission
+    order to whichever worker is free and may finish out of order; results
+    are delivered to `on_result(context, output, seconds)` strictly in
+    submission order, so per-camera tracking and alerting see frames in
+    sequence. `submit()` blocks while every region is taken, i.e.
+    every worker already has TASKS_PER_WORKER batches, which keeps latency bounded and lets the
+    capture side drop stale frames instead of queueing them.
+
+    `detector_factory(**factory_kwargs)` must be picklable (a module-level
+    function or class) because each worker builds its own model.
+    It is also a Detector, so `detect()` works as a blocking call.
+
+    A batch that times out is failed so later ones are not held up, but its
+    region stays reserved until the late result comes in or the worker that
+    took it is dead and reaped; a slow worker may still be reading it.
+    `start()` refuses to create a segment larger than the free space in
+    /dev/shm, since touching pages past the limit kills the server with SIGBUS.
+    """
+
+    backend = "pool"
+
+    def __init__(self, workers: int, detector_factory: Callable[..., Detector] = create_detector,
+                 factory_kwargs: Optional[dict] = None, max_batch: int = MAX_BATCH,
+                 frame_bytes: int = DEFAULT_FRAME_BYTES, on_result: Optional[Callable[[Any, Optional[list], float], None]] = None):
+        super().__init__()
+        self.workers = workers
+        self.detector_factory = detector_factory
+        self.factory_kwargs = factory_kwargs or {}
+        self.on_result = on_result
+        self.regions = workers * TASKS_PER_WORKER
+        self.region_bytes = max_batch * frame_bytes
+        self._context = multiprocessing.get_context("spawn")  # fork is unsafe with threads and CUDA
+        self._shm = None
+        self._tasks = None
+        self._results = None
+        self._processes: List[multiprocessing.Process] = []
+        self._busy = None  # per-worker sequence number of the batch being run
+        self._free_regions: "queue.Queue[int]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._next = 1  # next sequence number to deliver
+        self._pending: Dict[int, tuple] = {}  # seq -> (context, region, submitted at)
+        self._finished: Dict[int, tuple] = {}  # seq -> (output, seconds, error, returned), waiting for earlier ones
+        self._held: Dict[int, int] = {}  # seq -> region of a timed-out batch a worker may still read
+        self._lost = set()  # pending seqs whose worker died with them
+        self._collector: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.submitted = 0
+        self.pickled_frames = 0
+        self.failed = 0
+        self.restarts = 0
+
+    @property
+    def shared_bytes(self) -> int:
+        return self.regions * self.region_bytes
+
+    def start(self):
+        """Spawn the workers and wait until every one has loaded its model. Raises
+        SharedMemoryTooSmall, before starting anything, if the segment would not fit."""
+        free = shm_free_bytes()
+        if free is not None and free < self.shared_bytes:
+            raise SharedMemoryTooSmall(self.shared_bytes, free)
+        self._shm = shared_memory.SharedMemory(create=True, size=self.shared_bytes)
+        for region in range(self.regions):
+            self._free_regions.put(region)
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        self._busy = self._context.RawArray('q', self.workers)
+        self._processes = [self._spawn(index) for index in range(self.workers)]
+
+        deadline = time.monotonic() + READY_TIMEOUT
+        ready = 0
+        while ready < self.workers:
+            try:
+                message = self._results.get(timeout=max(0.1, deadline - time.monotonic()))
+            except queue.Empty:
+                self.close()
+                raise RuntimeError(f"Only {ready} of {self.workers} inference workers started")
+            if message[0] == 'ready':
+                ready += 1
+                _, _, self.backend, self.names = message
+        self._collector = threading.Thread(target=self._collect, name="inference-pool", daemon=True)
+        self._collector.start()
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        self._busy[index] = 0
+        process = self._context.Process(
+            target=worker_main, name=f"inference-{index}", daemon=True,
+            args=(index, self._busy, self._shm.name, self._tasks, self._results,
+                  self.detector_factory, self.factory_kwargs))
+        process.start()
+        return process
+
+    def submit(self, frames, context=None) -> int:
+        """Queue a batch of BGR frames; its output reaches on_result in submission order.
+        A batch without frames still takes its turn, so callers can keep ordering for frames
+        that skip inference. Returns the batch's sequence number."""
+        region = self._take_region()
+        offset = region * self.region_bytes
+        end = offset + self.region_bytes
+        items = []
+        for frame in frames:
+            if frame.dtype != np.uint8 or offset + frame.nbytes > end:
+                self.pickled_frames += 1
+                items.append((None, frame))
+                continue
+            view = np.ndarray(frame.shape, np.uint8, buffer=self._shm.buf, offset=offset)
+            view[...] = frame
+            del view
+            items.append((offset, frame.shape))
+            offset += frame.nbytes
+
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._pending[seq] = (context, region, time.monotonic())
+            self.submitted += 1
+        if items:
+            self._tasks.put((seq, items))
+        else:
+            self._results.put(('done', seq, [], 0.0, None))
+        return seq
+
+    def _take_region(self) -> int:
+        while True:
+            try:
+                return self._free_regions.get(timeout=0.5)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    raise RuntimeError("inference pool closed")
+
+    def detect(self, frames):
+        call = SyncCall()
+        self.submit(frames, call)
+        call.done.wait()
+        if call.error is not None:
+            raise RuntimeError(call.error)
+        return call.output
+
+    def _collect(self):
+        while not self._stopping.is_set():
+            try:
+                message = self._results.get(timeout=0.5)
+            except queue.Empty:
+                message = None
+            except (EOFError, OSError):
+                break
+            if message is not None and message[0] == 'done':
+                _, seq, output, seconds, error = message
+                with self._lock:
+                    if seq in self._pending:
+                        self._finished[seq] = (output, seconds, error, True)
+                    elif seq in self._held:
+                        # Late result of a timed-out batch: the worker is done with its region
+                        self._free_regions.put(self._held.pop(seq))
+            self._check_workers()
+            self._deliver()
+
+    def _check_workers(self):
+        """Replace dead workers; their batches are failed by the head-of-line timeout"""
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or self._stopping.is_set():
+                continue
+            process.join()  # reaped, so it can no longer touch the segment
+            log.error("❌ Inference worker %s exited with %s, restarting", process.name, process.exitcode)
+            seq = self._busy[index]
+            with self._lock:
+                if seq in self._held:
+                    self._free_regions.put(self._held.pop(seq))
+                elif seq in self._pending:
+                    self._lost.add(seq)
+            self._processes[index] = self._spawn(index)
+            self.restarts += 1
+        with self._lock:
+            head = self._pending.get(self._next)
+            if head is not None and self._next not in self._finished and time.monotonic() - head[2] > TASK_TIMEOUT:
+                self._finished[self._next] = (None, 0.0, f"no result after {TASK_TIMEOUT:.0f}s", False)
+
+    def _deliver(self):
+        while True:
+            with self._lock:
+                seq = self._next
+                if seq not in self._finished:
+                    return
+                output, seconds, error, returned = self._finished.pop(seq)
+                context, region, _ = self._pending.pop(seq)
+                self._next += 1
+                if returned or seq in self._lost:
+                    self._free_regions.put(region)
+                else:
+                    self._held[seq] = region
+                self._lost.discard(seq)
+            if error is not None:
+                self.failed += 1
+                log.error("Detection error: %s", error)
+                output = None
+
+            if isinstance(context, SyncCall):
+                context.output, context.error = output, error
+                context.done.set()
+            elif self.on_result is not None:
+                try:
+                    self.on_result(context, output, seconds)
+                except Exception as e:
+                    log.error("❌ Inference result handling error: %s", e)
+
+    def close(self):
+        self._stopping.set()
+        if self._collector is not None:
+            self._collector.join(timeout=2)
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        with self._lock:
+            calls = [context for context, _, _ in self._pending.values() if isinstance(context, SyncCall)]
+            self._pending.clear()
+            self._finished.clear()
+            self._held.clear()
+        for call in calls:
+            call.error = "inference pool closed"
+            call.done.set()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._pending)
+        return {
+            'workers': self.workers,
+            'alive': sum(process.is_alive() for process in self._processes),
+            'in_flight': in_flight,
+            'submitted': self.submitted,
+            'failed': self.failed,
+            'restarts': self.restarts,
+            'shared_regions': self.regions,
+            'shared_bytes': self.shared_bytes,
+            'free_regions': self._free_regions.qsize(),
+            'held_regions': len(self._held),
+            'pickled_frames': self.pickled_frames,
+        }
@@ -0,0 +1,59 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+DEFAULT_LOG_LEVEL = "INFO"
+FRAME_LOG_INTERVAL = 10.0  # seconds between repeats of the same per-frame message
+
+
+class RateLimitFilter(logging.Filter):
+    """Let each message template through at most once per `interval` seconds.
+
+    Records are keyed by logger, level and unformatted message, so
+    "Detected %d objects" is limited as one message whatever the numbers.
+    The next record let through notes how many were suppressed meanwhile.
+    """
+
+    def __init__(self, interval: float = FRAME_LOG_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self._last: Dict[Tuple[str, int, str], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._last.get(key, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._last[key] = (last, suppressed + 1)
+                return False
+            self._last[key] = (now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+        return True
+
+
+def configure(level: Optional[str] = None):
+    """Send backend.* loggers to stderr at `level`, or LOG_LEVEL (default INFO) on first use"""
+    logger = logging.getLogger("backend")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+        level = level or os.environ.get("LOG_LEVEL", DEFAULT_LOG_LEVEL)
+    if level:
+        logger.setLevel(level.upper())
+    return logger
+
+
+def get_logger(name: str, rate_limited: bool = False) -> logging.Logger:
+    """A backend.* logger; `rate_limited` ones are for messages emitted on every frame"""
+    configure()
+    logger = logging.getLogger(name)
+    if rate_limited and not any(isinstance(f, RateLimitFilter) for f in logger.filters):
+        logger.addFilter(RateLimitFilter())
+    return logger
@@ -0,0 +1,173 @@
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+# Upper bounds (seconds) of the cumulative histogram buckets, +Inf implied
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW = 1024  # most recent samples per series the quantiles are computed over
+
+PREFIX = "rtsp_detection"
+HELP = {
+    'stage_seconds': ('histogram', 'Time spent in each pipeline stage'),
+    'stage_recent_seconds': ('summary', f'Quantiles of each stage over its last {WINDOW} samples'),
+    'frames_captured_total': ('counter', 'Frames read from the camera'),
+    'frames_dropped_total': ('counter', 'Captured frames replaced before inference picked them up'),
+    'inferences_skipped_total': ('counter', 'Frames that reused earlier detections because nothing moved'),
+    'frames_duplicate_total': ('counter', 'Near-duplicate frames that reused the previous detections and JPEGs'),
+    'sends_skipped_total': ('counter', 'Messages not sent to connected clients because they already had them'),
+    'alerts_total': ('counter', 'Alerts raised'),
+    'evidence_dropped_total': ('counter', 'Photo and clip writes dropped because the writer was saturated'),
+    'clients': ('gauge', 'Connected websocket clients'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def label_key(labels: Dict[str, Optional[str]]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+def format_labels(labels: Labels, **extra) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts for Prometheus plus a ring of recent samples for percentiles"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent: deque = deque(maxlen=WINDOW)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def quantiles(self) -> Dict[float, float]:
+        if not self.recent:
+            return {}
+        values = np.quantile(np.fromiter(self.recent, float, len(self.recent)), QUANTILES)
+        return dict(zip(QUANTILES, values.tolist()))
+
+
+class MetricsRegistry:
+    """Latency histograms per (stage, camera) and labelled counters/gauges.
+
+    Stages recorded by the pipeline: capture, inference, postprocess, colors,
+    draw, encode, send, photo_write and total (capture to message ready).
+
+    Recording is a dict lookup and a few additions under one lock, cheap
+    enough for every frame. `render()` produces the Prometheus text format;
+    values owned by other components (frame buffers, broadcasters) are
+    passed to `set()` just before rendering.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Labels, LatencyHistogram] = {}
+        self._values: Dict[str, Dict[Labels, float]] = {}
+
+    def observe(self, stage: str, seconds: float, camera: Optional[str] = None):
+        key = label_key({'stage': stage, 'camera': camera})
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str, camera: Optional[str] = None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, camera)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = label_key(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        """Record the current value of a counter or gauge tracked elsewhere"""
+        with self._lock:
+            self._values.setdefault(name, {})[label_key(labels)] = value
+
+    def clear(self, name: str):
+        """Drop every series of a value metric, e.g. before re-setting gauges of cameras that may be gone"""
+        with self._lock:
+            self._values.pop(name, None)
+
+    def reset(self):
+        """Forget everything recorded so far, e.g. after a warm-up period"""
+        with self._lock:
+            self._histograms.clear()
+            self._values.clear()
+
+    def percentiles(self) -> Dict[str, Dict[str, dict]]:
+        """{camera: {stage: {'p50': ms, 'p95': ms, 'p99': ms, 'count': n}}} over the recent window"""
+        with self._lock:
+            histograms = [(dict(key), histogram.quantiles(), histogram.count)
+                          for key, histogram in self._histograms.items()]
+        result: Dict[str, Dict[str, dict]] = {}
+        for labels, quantiles, count in histograms:
+            summary = {f"p{int(q * 100)}": round(value * 1000, 2) for q, value in quantiles.items()}
+            summary['count'] = count
+            result.setdefault(labels.get('camera', 'all'), {})[labels['stage']] = summary
+        return result
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = [(key, list(h.counts), h.sum, h.count, h.quantiles())
+                          for key, h in sorted(self._histograms.items())]
+            values = {name: sorted(series.items()) for name, series in self._values.items()}
+
+        lines = []
+
+        def header(name):
+            kind, text = HELP[name]
+            lines.append(f"# HELP {PREFIX}_{name} {text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        if histograms:
+            header('stage_seconds')
+            for key, counts, total, count, _ in histograms:
+                cumulative = 0
+                for bound, bucket_count in zip(list(BUCKETS) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append(f"{PREFIX}_stage_seconds_bucket{format_labels(key, le=bound)} {cumulative}")
+                lines.append(f"{PREFIX}_stage_seconds_sum{format_labels(key)} {total}")
+                lines.append(f"{PREFIX}_stage_seconds_count{format_labels(key)} {count}")
+            header('stage_recent_seconds')
+            for key, _, total, count, quantiles in histograms:
+                for q, value in quantiles.items():
+                    lines.append(f"{PREFIX}_stage_recent_seconds{format_labels(key, quantile=q)} {value}")
+                lines.append(f"{PREFIX}_stage_recent_seconds_sum{format_labels(key)} {total}")
+                lines.append(f"{PREFIX}_stage_recent_seconds_count{format_labels(key)} {count}")
+
+        for name, series in values.items():
+            header(name)
+            for key, value in series:
+                lines.append(f"{PREFIX}_{name}{format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def observe_many(metrics: Optional[MetricsRegistry], stage: str, seconds: float, cameras: Iterable[str]):
+    """Record one shared duration (e.g. a batched model call) against each camera in it"""
+    if metrics is not None:
+        for camera in cameras:
+            metrics.observe(stage, seconds, camera)
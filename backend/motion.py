@@ -0,0 +1,125 @@
+import time
+from typing import Optional
+
+import cv2
+
+DEFAULT_MOTION_THRESHOLD = 0.01  # fraction of downscaled pixels that must change
+DEFAULT_KEEPALIVE_SECONDS = 2.0  # run the detector at least this often regardless of motion
+DEFAULT_DUPLICATE_DELTA = 2.0  # largest change of any thumbnail cell (0-255) in a near-duplicate frame
+
+
+class MotionGate:
+    """Cheap pre-stage deciding whether a frame is worth a full detector run.
+
+    Each frame is shrunk to a small blurred grayscale image and compared with
+    the image from the last detector run; the model only runs when enough
+    pixels changed or the keep-alive interval has passed. A threshold of 0
+    disables gating.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_MOTION_THRESHOLD,
+                 keepalive: float = DEFAULT_KEEPALIVE_SECONDS,
+                 width: int = 160, pixel_delta: int = 25):
+        self.threshold = threshold
+        self.keepalive = keepalive
+        self.width = width
+        self.pixel_delta = pixel_delta
+        self._reference = None
+        self._last_run = 0.0
+        self.checked = 0
+        self.skipped = 0
+        self.last_motion = 0.0
+
+    def _downscale(self, frame):
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(height * self.width / width))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def should_run(self, frame, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        self.checked += 1
+
+        if self.threshold <= 0:
+            self._last_run = now
+            return True
+
+        gray = self._downscale(frame)
+        if self._reference is None or self._reference.shape != gray.shape:
+            motion = 1.0
+        else:
+            diff = cv2.absdiff(gray, self._reference)
+            _, changed = cv2.threshold(diff, self.pixel_delta, 255, cv2.THRESH_BINARY)
+            motion = cv2.countNonZero(changed) / changed.size
+        self.last_motion = motion
+
+        if motion >= self.threshold or now - self._last_run >= self.keepalive:
+            self._reference = gray
+            self._last_run = now
+            return True
+
+        self.skipped += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            'inferences_run': self.checked - self.skipped,
+            'inferences_skipped': self.skipped,
+            'skip_ratio': round(self.skipped / self.checked, 3) if self.checked else 0.0,
+            'motion_level': round(self.last_motion, 4),
+        }
+
+
+class DuplicateFilter:
+    """Recognizes frames that are near-identical to the last frame rendered in full.
+
+    Each frame is area-averaged down to a tiny grayscale thumbnail, which
+    smooths out sensor and compression noise, and compared cell by cell with
+    the thumbnail of the reference frame. Using the largest cell change rather
+    than a mean or a hash keeps small moving objects from passing as
+    duplicates. A duplicate can reuse the reference frame's detections and
+    encoded JPEGs as they are. `key` is anything else the rendered output
+    depends on (e.g. the zone version); a new key ends the run of duplicates.
+    A delta of 0 disables the filter.
+    """
+
+    def __init__(self, pixel_delta: float = DEFAULT_DUPLICATE_DELTA, width: int = 64):
+        self.pixel_delta = pixel_delta
+        self.width = width
+        self._reference = None
+        self._key = None
+        self.checked = 0
+        self.duplicates = 0
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(height * self.width / width))),
+                           interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def is_duplicate(self, frame, key=None) -> bool:
+        """True if the frame can stand in for the reference; otherwise it becomes the reference"""
+        self.checked += 1
+        if self.pixel_delta <= 0:
+            return False
+
+        thumbnail = self._thumbnail(frame)
+        if (self._reference is not None and self._reference.shape == thumbnail.shape and key == self._key
+                and cv2.norm(thumbnail, self._reference, cv2.NORM_INF) <= self.pixel_delta):
+            self.duplicates += 1
+            return True
+
+        self._reference = thumbnail
+        self._key = key
+        return False
+
+    def reset(self):
+        """Forget the reference, e.g. when its frame could not be rendered"""
+        self._reference = None
+
+    def stats(self) -> dict:
+        return {
+            'frames_duplicate': self.duplicates,
+            'duplicate_ratio': round(self.duplicates / self.checked, 3) if self.checked else 0.0,
+        }
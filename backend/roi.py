@@ -0,0 +1,70 @@
+import numpy as np
+
+from backend.detections import empty_arrays
+
+ROI_PADDING = 32  # pixels added around each zone so objects on the border are not cut
+FULL_FRAME_RATIO = 0.8  # above this share of the frame, cropping costs more than it saves
+
+
+def zone_rects(zones, frame_shape, padding=ROI_PADDING):
+    """Padded bounding rectangles of the zone polygons, clipped to the frame and merged"""
+    height, width = frame_shape[:2]
+    rects = []
+    for points in list(zones.values()):
+        if len(points) < 3:
+            continue
+        pts = np.asarray(points, np.int32)
+        x1, y1 = pts.min(axis=0) - padding
+        x2, y2 = pts.max(axis=0) + padding
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(width, int(x2)), min(height, int(y2))
+        if x2 > x1 and y2 > y1:
+            rects.append((x1, y1, x2, y2))
+    return merge_rects(rects)
+
+
+def merge_rects(rects):
+    """Repeatedly union overlapping rectangles until none overlap"""
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+
+def inference_regions(zones, frame_shape):
+    """Rectangles the detector should run on; None means use the full frame"""
+    rects = zone_rects(zones, frame_shape)
+    if not rects:
+        return None
+    height, width = frame_shape[:2]
+    area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in rects)
+    if area >= FULL_FRAME_RATIO * width * height:
+        return None
+    return rects
+
+
+def crop_regions(frame, rects):
+    return [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in rects]
+
+
+def merge_region_arrays(region_arrays, rects):
+    """Shift per-crop detections back to full-frame coordinates and concatenate them"""
+    if not region_arrays:
+        return empty_arrays()
+    boxes, confidences, class_ids = [], [], []
+    for (crop_boxes, crop_conf, crop_cls), (x1, y1, _, _) in zip(region_arrays, rects):
+        boxes.append(crop_boxes + np.array([x1, y1, x1, y1], np.float32))
+        confidences.append(crop_conf)
+        class_ids.append(crop_cls)
+    return np.concatenate(boxes), np.concatenate(confidences), np.concatenate(class_ids)
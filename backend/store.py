@@ -0,0 +1,318 @@
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+DEFAULT_DB_PATH = "events.db"
+DEFAULT_RETENTION_DAYS = 30.0
+DEFAULT_EVIDENCE_QUOTA_BYTES = 10 * 1024 ** 3
+MAX_PAGE_SIZE = 500
+EVIDENCE_KINDS = ('photo', 'clip')  # each has a <kind>_path column on alerts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    seq INTEGER,
+    type TEXT NOT NULL,
+    camera_id TEXT,
+    track_id INTEGER,
+    zone_id TEXT,
+    timestamp REAL NOT NULL,
+    message TEXT,
+    confidence REAL,
+    bbox TEXT,
+    photo_path TEXT,
+    clip_path TEXT
+);
+CREATE INDEX IF NOT EXISTS alerts_time ON alerts (timestamp);
+CREATE INDEX IF NOT EXISTS alerts_type_time ON alerts (type, timestamp);
+CREATE INDEX IF NOT EXISTS alerts_camera_time ON alerts (camera_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS evidence (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    alert_type TEXT,
+    timestamp REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS evidence_kind_time ON evidence (kind, timestamp);
+CREATE INDEX IF NOT EXISTS evidence_kind_type_time ON evidence (kind, alert_type, timestamp);
+CREATE INDEX IF NOT EXISTS evidence_time ON evidence (timestamp);
+"""
+
+# Evidence filenames start with the alert type, then the capture date and time
+EVIDENCE_NAME = re.compile(r'^(.+?)_\d{8}_\d{6}')
+
+ALERT_COLUMNS = ('seq', 'type', 'camera_id', 'track_id', 'zone_id', 'timestamp', 'message',
+                 'confidence', 'bbox', 'photo_path', 'clip_path')
+
+
+def connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def alert_row(alert: dict) -> tuple:
+    return tuple(json.dumps(alert['bbox']) if key == 'bbox' and alert.get('bbox') is not None else alert.get(key)
+                 for key in ALERT_COLUMNS)
+
+
+def encode_cursor(row) -> str:
+    return f"{row['timestamp']!r}:{row['id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    timestamp, _, row_id = cursor.partition(':')
+    return float(timestamp), int(row_id)
+
+
+def page_query(table: str, filters: List[Tuple[str, object]], cursor: Optional[str], limit: int):
+    """Newest-first keyset page: rows ordered after `cursor` matching every filter"""
+    clauses = [clause for clause, _ in filters]
+    params = [value for _, value in filters]
+    if cursor:
+        # Rows are ordered by (timestamp, id), which the (…, timestamp) indexes
+        # give for free since every index entry ends in the rowid
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = f"SELECT * FROM {table} {where} ORDER BY timestamp DESC, id DESC LIMIT ?"
+    return sql, params + [limit]
+
+
+class EventStore:
+    """Persistent, indexed alert and evidence-file metadata in SQLite (WAL mode).
+
+    Writes are queued and committed in batches by one background thread;
+    reads open their own connections, which WAL lets run alongside the
+    writer. Pages are fetched newest first with a keyset cursor, so listing
+    cost does not depend on how many events are stored. The writer also
+    enforces retention: alerts and files older than `retention_days` are
+    removed, and the oldest files are deleted while evidence on disk
+    exceeds `quota_bytes`; each deleted path is passed to `on_deleted`.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, retention_days: float = DEFAULT_RETENTION_DAYS,
+                 quota_bytes: int = DEFAULT_EVIDENCE_QUOTA_BYTES, batch_size: int = 500,
+                 flush_interval: float = 0.5, retention_interval: float = 600.0,
+                 on_deleted: Optional[Callable[[str], None]] = None):
+        self.path = path
+        self.on_deleted = on_deleted
+        self.retention_days = retention_days
+        self.quota_bytes = quota_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_interval = retention_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=100_000)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._evidence_bytes = 0
+        self.written = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    def open(self, backfill_dirs=()):
+        """Create the schema and start the writer; existing files in `backfill_dirs`
+        ((kind, directory) pairs) are indexed once if the store has no evidence yet"""
+        if self._thread is not None:
+            return
+        connection = connect(self.path)
+        connection.executescript(SCHEMA)
+        if connection.execute("SELECT 1 FROM evidence LIMIT 1").fetchone() is None:
+            for kind, directory in backfill_dirs:
+                self._backfill(connection, kind, directory)
+        self._evidence_bytes = connection.execute("SELECT COALESCE(SUM(size), 0) FROM evidence").fetchone()[0]
+        connection.commit()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(connection,), name="event-store", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _backfill(self, connection, kind: str, directory: str):
+        if not os.path.isdir(directory):
+            return
+        rows = []
+        for entry in os.scandir(directory):
+            if entry.is_file():
+                stat = entry.stat()
+                match = EVIDENCE_NAME.match(entry.name)
+                rows.append((kind, entry.path, match.group(1) if match else None, stat.st_mtime, stat.st_size))
+        connection.executemany(
+            "INSERT OR IGNORE INTO evidence (kind, path, alert_type, timestamp, size) VALUES (?, ?, ?, ?, ?)", rows)
+        print(f"🗂️ Indexed {len(rows)} existing {kind} files from {directory}")
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def add_alert(self, alert: dict):
+        self._put(('alert', alert_row(alert)))
+
+    def add_evidence(self, kind: str, path: str, alert_type: Optional[str], timestamp: float, size: int):
+        self._put(('evidence', (kind, path, alert_type, timestamp, size)))
+
+    def forget_evidence(self, kind: str, path: str):
+        """Unlink alerts from a photo or clip that will never be written"""
+        if kind in EVIDENCE_KINDS:
+            self._put(('lost', (kind, path)))
+
+    def _run(self, connection):
+        next_retention = time.monotonic()
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                if batch:
+                    self._write(connection, batch)
+                if time.monotonic() >= next_retention:
+                    next_retention = time.monotonic() + self.retention_interval
+                    self._enforce_retention(connection)
+            except sqlite3.Error as e:
+                print(f"❌ Event store error: {e}")
+        connection.close()
+
+    def _write(self, connection, batch):
+        alerts = [row for kind, row in batch if kind == 'alert']
+        evidence = [row for kind, row in batch if kind == 'evidence']
+        lost = [row for kind, row in batch if kind == 'lost']
+        with connection:
+            if alerts:
+                connection.executemany(
+                    f"INSERT INTO alerts ({', '.join(ALERT_COLUMNS)}) VALUES ({', '.join('?' * len(ALERT_COLUMNS))})",
+                    alerts)
+            if evidence:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO evidence (kind, path, alert_type, timestamp, size) VALUES (?, ?, ?, ?, ?)",
+                    evidence)
+            for kind, path in lost:
+                connection.execute(f"UPDATE alerts SET {kind}_path = NULL WHERE {kind}_path = ?", (path,))
+        self._evidence_bytes += sum(row[4] for row in evidence)
+        self.written += len(batch)
+        if self._evidence_bytes > self.quota_bytes:
+            self._enforce_retention(connection)
+
+    def _delete_evidence(self, connection, rows):
+        for row in rows:
+            try:
+                os.remove(row['path'])
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"❌ Could not delete {row['path']}: {e}")
+            if self.on_deleted is not None:
+                self.on_deleted(row['path'])
+        with connection:
+            connection.executemany("DELETE FROM evidence WHERE id = ?", [(row['id'],) for row in rows])
+        self._evidence_bytes -= sum(row['size'] for row in rows)
+        self.evicted += len(rows)
+
+    def _enforce_retention(self, connection):
+        """Drop rows and files past the age limit, then the oldest files over the disk quota"""
+        cutoff = time.time() - self.retention_days * 86400
+        with connection:
+            connection.execute("DELETE FROM alerts WHERE timestamp < ?", (cutoff,))
+        while True:
+            rows = connection.execute(
+                "SELECT id, path, size FROM evidence WHERE timestamp < ? ORDER BY timestamp LIMIT 1000",
+                (cutoff,)).fetchall()
+            if not rows:
+                break
+            self._delete_evidence(connection, rows)
+
+        while self._evidence_bytes > self.quota_bytes:
+            rows = connection.execute("SELECT id, path, size FROM evidence ORDER BY timestamp LIMIT 100").fetchall()
+            if not rows:
+                self._evidence_bytes = 0
+                break
+            excess = self._evidence_bytes - self.quota_bytes
+            victims = []
+            for row in rows:
+                victims.append(row)
+                excess -= row['size']
+                if excess <= 0:
+                    break
+            self._delete_evidence(connection, victims)
+
+    def _query(self, sql, params):
+        connection = connect(self.path)
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def _page(self, table, filters, cursor, limit):
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        rows = self._query(*page_query(table, filters, cursor, limit + 1))
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return [dict(row) for row in rows[:limit]], next_cursor
+
+    def alerts(self, start: Optional[float] = None, end: Optional[float] = None, alert_type: Optional[str] = None,
+               camera_id: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50):
+        """One page of alerts, newest first; pass the returned cursor back for the next page"""
+        filters = time_filters(start, end)
+        if alert_type:
+            filters.append(("type = ?", alert_type))
+        if camera_id:
+            filters.append(("camera_id = ?", camera_id))
+        rows, next_cursor = self._page('alerts', filters, cursor, limit)
+        for row in rows:
+            row['bbox'] = json.loads(row['bbox']) if row['bbox'] else None
+        return rows, next_cursor
+
+    def evidence(self, kind: str = 'photo', start: Optional[float] = None, end: Optional[float] = None,
+                 alert_type: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50):
+        filters = [("kind = ?", kind)]
+        if alert_type:
+            filters.append(("alert_type = ?", alert_type))
+        filters += time_filters(start, end)
+        return self._page('evidence', filters, cursor, limit)
+
+    def stats(self) -> dict:
+        return {
+            'pending_writes': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'evidence_bytes': self._evidence_bytes,
+            'evicted_files': self.evicted,
+        }
+
+
+def time_filters(start: Optional[float], end: Optional[float]):
+    filters = []
+    if start is not None:
+        filters.append(("timestamp >= ?", start))
+    if end is not None:
+        filters.append(("timestamp < ?", end))
+    return filters
+
+
+def create_event_store(**kwargs) -> EventStore:
+    """Event store configured from EVENTS_DB, EVENT_RETENTION_DAYS and EVIDENCE_QUOTA_MB"""
+    quota_mb = os.environ.get("EVIDENCE_QUOTA_MB")
+    return EventStore(
+        path=os.environ.get("EVENTS_DB", DEFAULT_DB_PATH),
+        retention_days=float(os.environ.get("EVENT_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)),
+        quota_bytes=int(float(quota_mb) * 1024 * 1024) if quota_mb else DEFAULT_EVIDENCE_QUOTA_BYTES,
+        **kwargs,
+    )
@@ -0,0 +1,167 @@
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import NamedTuple, Optional
+
+import cv2
+
+THUMBNAIL_SIZES = {'small': 160, 'medium': 320, 'large': 640}  # longest side in pixels
+THUMBNAIL_QUALITY = 80
+DEFAULT_MEMORY_BYTES = 32 * 1024 * 1024
+THUMBNAIL_DIR = ".thumbnails"  # inside the photo directory; the evidence index only scans files
+
+
+class PhotoVersion(NamedTuple):
+    """What a photo variant is identified by: its source file's size and mtime"""
+    etag: str
+    last_modified: str
+    mtime: float
+
+
+def photo_version(path: str, variant: str) -> PhotoVersion:
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{variant}"'
+    return PhotoVersion(etag, formatdate(stat.st_mtime, usegmt=True), stat.st_mtime)
+
+
+def not_modified(version: PhotoVersion, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """Conditional GET check: If-None-Match wins over If-Modified-Since, as in RFC 9110"""
+    if if_none_match is not None:
+        return version.etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    if if_modified_since is not None:
+        try:
+            return int(version.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# libjpeg can decode straight to 1/8, 1/4 or 1/2 scale for a fraction of the work
+REDUCED_READS = (cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_COLOR)
+
+
+def make_thumbnail(path: str, target: int) -> bytes:
+    """JPEG of the photo scaled so its longest side is at most `target`.
+
+    The photo is decoded at the smallest DCT scale that is still at least
+    `target` wide (smaller decodes are tried first and are nearly free), then
+    INTER_AREA finishes the resize.
+    """
+    image = None
+    for flag in REDUCED_READS:
+        image = cv2.imread(path, flag)
+        if image is None or max(image.shape[:2]) >= target:
+            break
+    if image is None:
+        raise ValueError(f"could not decode {path}")
+    height, width = image.shape[:2]
+    scale = target / max(width, height)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY])
+    if not ok:
+        raise ValueError(f"could not encode thumbnail of {path}")
+    return buffer.tobytes()
+
+
+class ThumbnailCache:
+    """Fixed-size thumbnails of captured photos, generated once on demand.
+
+    Hot thumbnails stay in an in-memory LRU bounded by `memory_bytes`;
+    every generated thumbnail is also written under `directory`, so after a
+    restart or an LRU eviction it is served from disk instead of decoded
+    and re-encoded. Entries are keyed by the source's ETag, so a replaced
+    photo never gets a stale thumbnail. Concurrent requests for the same
+    thumbnail share one encode.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int = DEFAULT_MEMORY_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self._entries: OrderedDict = OrderedDict()  # (path, size, etag) -> JPEG bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> lock held while it is generated
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.generated = 0
+
+    def disk_path(self, path: str, size: str) -> str:
+        return os.path.join(self.directory, size, os.path.basename(path))
+
+    def _remember(self, key, data: bytes):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.memory_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get(self, path: str, size: str, version: PhotoVersion) -> bytes:
+        """Thumbnail bytes for `path` at a THUMBNAIL_SIZES key; blocking, call off the event loop"""
+        key = (path, size, version.etag)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return data
+            pending = self._pending.setdefault(key, threading.Lock())
+
+        with pending:
+            with self._lock:
+                data = self._entries.get(key)
+            if data is not None:
+                self.memory_hits += 1
+                return data
+            try:
+                data = self._load(path, size, version)
+                self._remember(key, data)
+                return data
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+    def _load(self, path: str, size: str, version: PhotoVersion) -> bytes:
+        cached = self.disk_path(path, size)
+        try:
+            # A disk thumbnail older than its source belongs to a previous file of that name
+            if os.stat(cached).st_mtime >= version.mtime:
+                with open(cached, 'rb') as f:
+                    self.disk_hits += 1
+                    return f.read()
+        except FileNotFoundError:
+            pass
+
+        data = make_thumbnail(path, THUMBNAIL_SIZES[size])
+        self.generated += 1
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        temporary = f"{cached}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, cached)
+        return data
+
+    def discard(self, path: str):
+        """Forget every thumbnail of a deleted photo, in memory and on disk"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                self._bytes -= len(self._entries.pop(key))
+        for size in THUMBNAIL_SIZES:
+            try:
+                os.remove(self.disk_path(path, size))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            'memory_entries': len(self._entries),
+            'memory_bytes': self._bytes,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'generated': self.generated,
+        }
@@ -0,0 +1,151 @@
+import numpy as np
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(len(a), len(b)) IoU of xyxy boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class Tracker:
+    """SORT-style multi-object tracker giving detections stable IDs.
+
+    Tracks live in fixed slots of preallocated arrays. Each update predicts
+    every track with a constant-velocity alpha-beta filter (a steady-state
+    Kalman filter), associates predictions to detections of the same class
+    by IoU (greedy, highest overlap first), coasts unmatched tracks for up to
+    `max_age` updates and then frees their slot. The last `history` centers
+    of each track are kept in a ring buffer for movement analysis.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 15, history: int = 12,
+                 alpha: float = 0.85, beta: float = 0.3, capacity: int = 64):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.history_size = history
+        self.alpha = alpha
+        self.beta = beta
+        self._next_id = 1
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self.active = np.zeros(capacity, bool)
+        self.ids = np.zeros(capacity, np.int64)
+        self.class_ids = np.zeros(capacity, np.int64)
+        self.boxes = np.zeros((capacity, 4), np.float32)
+        self.velocity = np.zeros((capacity, 4), np.float32)
+        self.misses = np.zeros(capacity, np.int32)
+        self.history = np.zeros((capacity, self.history_size, 2), np.float32)
+        self.history_count = np.zeros(capacity, np.int32)
+        self.history_pos = np.zeros(capacity, np.int32)
+
+    def _grow(self, needed: int):
+        old = (self.active, self.ids, self.class_ids, self.boxes, self.velocity, self.misses,
+               self.history, self.history_count, self.history_pos)
+        capacity = len(self.active)
+        while capacity < needed:
+            capacity *= 2
+        self._allocate(capacity)
+        new = (self.active, self.ids, self.class_ids, self.boxes, self.velocity, self.misses,
+               self.history, self.history_count, self.history_pos)
+        for src, dst in zip(old, new):
+            dst[:len(src)] = src
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def _record(self, slots: np.ndarray, centers: np.ndarray):
+        self.history[slots, self.history_pos[slots]] = centers
+        self.history_pos[slots] = (self.history_pos[slots] + 1) % self.history_size
+        self.history_count[slots] = np.minimum(self.history_count[slots] + 1, self.history_size)
+
+    def update(self, boxes: np.ndarray, class_ids: np.ndarray) -> np.ndarray:
+        """Associate one frame's detections; returns the track slot of every detection.
+
+        `ids[slots]` gives the stable track IDs; slots index the history
+        queries below and are only valid until the next update.
+        """
+        boxes = boxes.astype(np.float32)
+        count = len(boxes)
+        track_slots = np.full(count, -1, np.int64)
+
+        live = np.flatnonzero(self.active)
+        predicted = self.boxes[live] + self.velocity[live]
+        matched_tracks = np.zeros(len(live), bool)
+
+        if len(live) and count:
+            iou = iou_matrix(predicted, boxes)
+            iou[self.class_ids[live][:, None] != class_ids[None, :]] = 0
+            rows, cols = np.nonzero(iou >= self.iou_threshold)
+            order = np.argsort(-iou[rows, cols], kind='stable')
+            for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+                if matched_tracks[r] or track_slots[c] >= 0:
+                    continue
+                matched_tracks[r] = True
+                track_slots[c] = live[r]
+
+        # Matched tracks: alpha-beta correction toward the measurement
+        matched_dets = np.flatnonzero(track_slots >= 0)
+        if len(matched_dets):
+            slots = track_slots[matched_dets]
+            prediction = predicted[np.searchsorted(live, slots)]
+            residual = boxes[matched_dets] - prediction
+            self.boxes[slots] = prediction + self.alpha * residual
+            self.velocity[slots] += self.beta * residual
+            self.misses[slots] = 0
+            self._record(slots, (boxes[matched_dets, :2] + boxes[matched_dets, 2:]) / 2)
+
+        # Unmatched tracks coast on their prediction until they expire
+        lost = live[~matched_tracks]
+        if len(lost):
+            self.boxes[lost] = predicted[~matched_tracks]
+            self.misses[lost] += 1
+            self.active[lost[self.misses[lost] > self.max_age]] = False
+
+        # Unmatched detections start new tracks in free slots
+        new_dets = np.flatnonzero(track_slots < 0)
+        if len(new_dets):
+            free = np.flatnonzero(~self.active)
+            if len(free) < len(new_dets):
+                self._grow(len(self.active) + len(new_dets))
+                free = np.flatnonzero(~self.active)
+            slots = free[:len(new_dets)]
+            self.active[slots] = True
+            self.ids[slots] = np.arange(self._next_id, self._next_id + len(slots))
+            self._next_id += len(slots)
+            self.class_ids[slots] = class_ids[new_dets]
+            self.boxes[slots] = boxes[new_dets]
+            self.velocity[slots] = 0
+            self.misses[slots] = 0
+            self.history_count[slots] = 0
+            self.history_pos[slots] = 0
+            self._record(slots, (boxes[new_dets, :2] + boxes[new_dets, 2:]) / 2)
+            track_slots[new_dets] = slots
+
+        return track_slots
+
+    def step_displacement(self, slots: np.ndarray) -> np.ndarray:
+        """Distance moved between the last two recorded centers (0 for new tracks)"""
+        size = self.history_size
+        last = self.history[slots, (self.history_pos[slots] - 1) % size]
+        previous = self.history[slots, (self.history_pos[slots] - 2) % size]
+        distance = np.linalg.norm(last - previous, axis=1)
+        return np.where(self.history_count[slots] >= 2, distance, 0.0)
+
+    def window_displacement(self, slots: np.ndarray, window: int = 4, min_history: int = 8) -> np.ndarray:
+        """Distance between the mean of the oldest and newest `window` centers in each
+        track's history; 0 until a track has at least `min_history` centers"""
+        size = self.history_size
+        pos = self.history_pos[slots][:, None]
+        count = self.history_count[slots][:, None]
+        offsets = np.arange(window)[None, :]
+        oldest = self.history[slots[:, None], (pos - count + offsets) % size].mean(axis=1)
+        newest = self.history[slots[:, None], (pos - 1 - offsets) % size].mean(axis=1)
+        distance = np.linalg.norm(newest - oldest, axis=1)
+        return np.where(self.history_count[slots] >= min_history, distance, 0.0)
@@ -0,0 +1,149 @@
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+
+from backend.logs import get_logger
+
+log = get_logger(__name__, rate_limited=True)
+
+MAX_BATCH = 8  # frames per model call
+
+
+class CapturedFrame(NamedTuple):
+    seq: int
+    ok: bool
+    payload: Any  # decoded frame when ok, otherwise an error message
+    captured_at: float  # wall-clock time.time() when the frame was read
+
+
+class LatestFrameBuffer:
+    """Single-slot hand-off where the newest frame always replaces an unread one.
+
+    The capture side never blocks, so the decoder drains the stream at camera
+    speed and the detector always picks up the freshest frame.
+    """
+
+    def __init__(self, ready: Optional[threading.Event] = None):
+        self._cond = threading.Condition()
+        self._item: Optional[CapturedFrame] = None
+        self._seq = 0
+        self._ready = ready  # shared event so one consumer can wait on many buffers
+        self.captured = 0
+        self.dropped = 0
+        self.last_latency_ms: Optional[float] = None
+
+    def put(self, ok: bool, payload):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._seq += 1
+            if ok:
+                self.captured += 1
+            self._item = CapturedFrame(self._seq, ok, payload, time.time())
+            self._cond.notify()
+        if self._ready is not None:
+            self._ready.set()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._item is not None, timeout):
+                return None
+            item, self._item = self._item, None
+            return item
+
+    def record_latency(self, captured: CapturedFrame):
+        """Note how long a frame took from capture until its message was ready"""
+        self.last_latency_ms = (time.time() - captured.captured_at) * 1000
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'frames_captured': self.captured,
+                'frames_dropped': self.dropped,
+                'last_latency_ms': self.last_latency_ms,
+            }
+
+
+class CaptureThread(threading.Thread):
+    """Continuously drain a cv2.VideoCapture into a LatestFrameBuffer"""
+
+    def __init__(self, cap, frames: LatestFrameBuffer, retry_delay: float = 0.5, name: str = "capture",
+                 metrics=None, camera_id: Optional[str] = None):
+        super().__init__(name=name, daemon=True)
+        self.cap = cap
+        self.frames = frames
+        self.retry_delay = retry_delay
+        self.metrics = metrics
+        self.camera_id = camera_id
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if self.cap is None or not self.cap.isOpened():
+                self.frames.put(False, 'RTSP stream not available')
+                self.stop_event.wait(self.retry_delay)
+                continue
+
+            started = time.perf_counter()
+            ret, frame = self.cap.read()
+            if self.metrics is not None:
+                self.metrics.observe('capture', time.perf_counter() - started, self.camera_id)
+            if not ret:
+                self.frames.put(False, 'Failed to read frame')
+                self.stop_event.wait(self.retry_delay)
+                continue
+
+            self.frames.put(True, frame)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class InferenceThread(threading.Thread):
+    """Run the blocking detect/draw/encode step off the event loop.
+
+    Waits on the shared `ready` event, collects the newest frame from every
+    source returned by `sources()` and hands them to `process_batch` in chunks
+    of at most `max_batch`, so one model call covers several cameras.
+    `process_batch([(key, captured), ...])` returns `[(key, message), ...]`
+    and `publish(key, message)` hands each message back to the async layer.
+    """
+
+    def __init__(self, sources, ready: threading.Event, process_batch, publish, max_batch: int = MAX_BATCH):
+        super().__init__(name="inference", daemon=True)
+        self.sources = sources
+        self.ready = ready
+        self.process_batch = process_batch
+        self.publish = publish
+        self.max_batch = max_batch
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if not self.ready.wait(timeout=0.5):
+                continue
+            self.ready.clear()
+
+            pending = []
+            for key, frames in self.sources():
+                captured = frames.get(timeout=0)
+                if captured is not None:
+                    pending.append((key, frames, captured))
+
+            for start in range(0, len(pending), self.max_batch):
+                batch = pending[start:start + self.max_batch]
+                try:
+                    messages = self.process_batch([(key, captured) for key, _, captured in batch])
+                except Exception as e:
+                    log.error("❌ Inference worker error: %s", e)
+                    continue
+
+                for _, frames, captured in batch:
+                    if captured.ok:
+                        frames.record_latency(captured)
+                for key, message in messages:
+                    if message is not None:
+                        self.publish(key, message)
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,198 @@
+import threading
+from collections.abc import MutableMapping
+from typing import Dict, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+ZONE_COLOR = (0, 0, 255)  # BGR red
+ZONE_ALPHA = 0.2  # opacity of the zone fill
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class CompiledZones(NamedTuple):
+    """A camera's zones rasterized for one frame size.
+
+    `labels` holds, per pixel, an index into `names` (0 = outside every zone;
+    where zones overlap the most recently added one wins). The overlay is cut
+    to the bounding rectangle of all zones, borders and labels, so drawing
+    never touches pixels outside it: within `rect` the frame is blended with
+    the solid `fill` where `fill_mask` is set, then `ink` (borders and labels)
+    is copied over where `ink_mask` is set.
+    """
+
+    labels: np.ndarray  # (H, W) int16
+    names: np.ndarray  # (zones + 1,) object, names[0] is None
+    rect: Optional[tuple]  # (x1, y1, x2, y2) around everything drawn, None without zones
+    fill: np.ndarray  # (h, w, 3) solid zone color
+    fill_mask: np.ndarray  # (h, w) uint8
+    ink: np.ndarray  # (h, w, 3)
+    ink_mask: np.ndarray  # (h, w) uint8
+
+
+def compile_zones(zones, frame_shape) -> CompiledZones:
+    """Rasterize (zone id, points) pairs into a label image and a ready-made overlay"""
+    height, width = frame_shape[:2]
+    labels = np.zeros((height, width), np.int16)
+    ink = np.zeros((height, width, 3), np.uint8)
+    ink_mask = np.zeros((height, width), np.uint8)
+    names = [None]
+
+    polygons = [(zone_id, np.asarray(points, np.int32)) for zone_id, points in zones if len(points) >= 3]
+    for zone_id, pts in polygons:
+        names.append(zone_id)
+        cv2.fillPoly(labels, [pts], len(names) - 1)
+
+    # All borders first, then all labels, so no border is drawn over a label
+    for _, pts in polygons:
+        for canvas, color in ((ink, ZONE_COLOR), (ink_mask, 255)):
+            cv2.polylines(canvas, [pts.reshape((-1, 1, 2))], True, color, 3)
+    for zone_id, pts in polygons:
+        label = f"RESTRICTED: {zone_id}"
+        label_size = cv2.getTextSize(label, LABEL_FONT, 0.6, 2)[0]
+        x, y = int(pts[0][0]), int(pts[0][1])
+        for canvas, color in ((ink, ZONE_COLOR), (ink_mask, 255)):
+            cv2.rectangle(canvas, (x, y - label_size[1] - 5), (x + label_size[0], y + 5), color, -1)
+        cv2.putText(ink, label, (x, y), LABEL_FONT, 0.6, (255, 255, 255), 2)
+
+    fill_mask = (labels > 0).astype(np.uint8)
+    rect = None
+    if polygons:
+        x, y, w, h = cv2.boundingRect(cv2.bitwise_or(fill_mask, ink_mask))
+        rect = (x, y, x + w, y + h)
+        fill_mask, ink_mask, ink = (a[y:y + h, x:x + w].copy() for a in (fill_mask, ink_mask, ink))
+    fill = np.empty(ink.shape, np.uint8)
+    fill[:] = ZONE_COLOR
+    return CompiledZones(labels, np.array(names, dtype=object), rect, fill, fill_mask, ink, ink_mask)
+
+
+def apply_overlay(frame, compiled: CompiledZones):
+    """Blend the translucent fill and draw borders and labels in place; one pass for all zones.
+    Costs one blend over the zones' bounding rectangle, never more than the whole frame."""
+    if compiled.rect is None:
+        return frame
+    x1, y1, x2, y2 = compiled.rect
+    region = frame[y1:y2, x1:x2]
+    blended = cv2.addWeighted(region, 1 - ZONE_ALPHA, compiled.fill, ZONE_ALPHA, 0)
+    cv2.copyTo(blended, compiled.fill_mask, region)
+    cv2.copyTo(compiled.ink, compiled.ink_mask, region)
+    return frame
+
+
+def foot_points(boxes):
+    """Bottom-center of each xyxy box: where a person stands, for zone membership"""
+    return np.column_stack([(boxes[:, 0] + boxes[:, 2]) // 2, boxes[:, 3] - 1])
+
+
+class ZoneMap(MutableMapping):
+    """A camera's restricted zones (id -> polygon points), compiled once per change.
+
+    Behaves like the plain dict it replaces. Every edit bumps a version; the
+    first frame after an edit rebuilds the label raster and overlay, so the
+    per-frame cost of drawing and membership lookups stays flat however many
+    zones there are. Safe to edit from the API while the inference thread reads.
+    """
+
+    def __init__(self):
+        self._zones: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._compiled: Optional[CompiledZones] = None
+        self._compiled_key = None
+        self._entries = ZoneEntries()  # for the camera's own tracker (inference thread only)
+
+    def __getitem__(self, zone_id):
+        with self._lock:
+            return self._zones[zone_id]
+
+    def __setitem__(self, zone_id, points):
+        with self._lock:
+            self._zones[zone_id] = points
+            self._version += 1
+
+    def __delitem__(self, zone_id):
+        with self._lock:
+            del self._zones[zone_id]
+            self._version += 1
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._zones))
+
+    def __len__(self):
+        return len(self._zones)
+
+    @property
+    def version(self) -> int:
+        """Bumped on every edit"""
+        return self._version
+
+    def items(self):
+        with self._lock:
+            return list(self._zones.items())
+
+    def values(self):
+        with self._lock:
+            return list(self._zones.values())
+
+    def compiled(self, frame_shape) -> CompiledZones:
+        """Label raster and overlay for this frame size, rebuilt only after edits"""
+        with self._lock:
+            key = (self._version, frame_shape[:2])
+            if self._compiled_key != key:
+                self._compiled = compile_zones(list(self._zones.items()), frame_shape)
+                self._compiled_key = key
+            return self._compiled
+
+    def lookup(self, points, frame_shape) -> np.ndarray:
+        """Zone id (or None) at each (x, y) point, as one raster gather"""
+        compiled = self.compiled(frame_shape)
+        height, width = compiled.labels.shape
+        xs = np.clip(points[:, 0], 0, width - 1)
+        ys = np.clip(points[:, 1], 0, height - 1)
+        return compiled.names[compiled.labels[ys, xs]]
+
+    def entered(self, track_ids, zone_ids, live_track_ids) -> np.ndarray:
+        """Mask of tracks now inside a zone they were not in on their previous frame"""
+        return self._entries.entered(track_ids, zone_ids, live_track_ids)
+
+
+class ZoneEntries:
+    """Zone each track was last seen in, to tell a track entering a zone from one already inside.
+
+    A track keeps its state while the tracker keeps it alive, so one missed
+    by the detector for a few frames does not re-trigger on return. Track IDs
+    are only meaningful to one tracker, so each tracker needs its own entries.
+    """
+
+    def __init__(self):
+        self._occupancy: Dict[int, Optional[str]] = {}
+
+    def entered(self, track_ids, zone_ids, live_track_ids) -> np.ndarray:
+        """Mask of tracks now inside a zone they were not in on their previous frame"""
+        track_ids = track_ids.tolist()
+        zone_ids = zone_ids.tolist()
+        entered = np.array([zone is not None and self._occupancy.get(track) != zone
+                            for track, zone in zip(track_ids, zone_ids)], bool)
+        live = set(live_track_ids.tolist())
+        self._occupancy = {track: zone for track, zone in self._occupancy.items() if track in live}
+        self._occupancy.update(zip(track_ids, zone_ids))
+        return entered
+
+
+class ZoneView:
+    """A camera's zones read through a separate ZoneEntries, so detections from another
+    tracker can be checked against them without touching the camera's own entry state"""
+
+    def __init__(self, zones: ZoneMap, entries: ZoneEntries):
+        self.zones = zones
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.zones)
+
+    def lookup(self, points, frame_shape) -> np.ndarray:
+        return self.zones.lookup(points, frame_shape)
+
+    def entered(self, track_ids, zone_ids, live_track_ids) -> np.ndarray:
+        return self.entries.entered(track_ids, zone_ids, live_track_ids)
@@ -1,5 +1,17 @@
 import React, { useEffect, useRef, useState } from 'react';
 
+// Binary frame header from the backend (see backend/broadcast.py):
+// magic 'F' | version | flags | reserved | seq u32 | captured_at f64 | latency_ms f32 | detections u16 | zones u16 |
+// source width u16 | source height u16
+const FRAME_HEADER_SIZE = 28;
+const FRAME_MAGIC = 0x46;
+
+// Zone points are in source-frame pixels, but the JPEG may be downscaled for this client's quality tier
+const scalePoint = (point: [number, number], scale: number): [number, number] =>
+  [Math.round(point[0] * scale), Math.round(point[1] * scale)];
+
+const withBinaryFormat = (url: string) => `${url}${url.includes('?') ? '&' : '?'}format=binary`;
+
 interface VideoStreamProps {
   wsUrl: string;
   onZoneDrawn: (points: [number, number][]) => void;
@@ -13,11 +25,13 @@ const VideoStream: React.FC<VideoStreamProps> = ({ wsUrl, onZoneDrawn, isDrawing
   const [drawingPoints, setDrawingPoints] = useState<[number, number][]>([]);
   const [isMaximized, setIsMaximized] = useState(false);
   const wsRef = useRef<WebSocket | null>(null);
+  const sourceSizeRef = useRef<[number, number] | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
 
   const connectWebSocket = () => {
     try {
-      const ws = new WebSocket(wsUrl);
+      const ws = new WebSocket(withBinaryFormat(wsUrl));
+      ws.binaryType = 'arraybuffer';
       wsRef.current = ws;
 
       ws.onopen = () => {
@@ -27,10 +41,22 @@ const VideoStream: React.FC<VideoStreamProps> = ({ wsUrl, onZoneDrawn, isDrawing
       };
 
       ws.onmessage = (event) => {
+        if (event.data instanceof ArrayBuffer) {
+          const header = new DataView(event.data, 0, FRAME_HEADER_SIZE);
+          if (event.data.byteLength > FRAME_HEADER_SIZE && header.getUint8(0) === FRAME_MAGIC) {
+            sourceSizeRef.current = [header.getUint16(24), header.getUint16(26)];
+            const jpeg = new Blob([event.data.slice(FRAME_HEADER_SIZE)], { type: 'image/jpeg' });
+            drawFrame(URL.createObjectURL(jpeg));
+          }
+          return;
+        }
         try {
           const data = JSON.parse(event.data);
           if (data.type === 'frame' && data.data) {
-            drawFrame(data.data);
+            if (data.source_width && data.source_height) {
+              sourceSizeRef.current = [data.source_width, data.source_height];
+            }
+            drawFrame(`data:image/jpeg;base64,${data.data}`);
           }
           if (data.type === 'error') {
             console.error('Backend error:', data.message);
@@ -89,7 +115,7 @@ const VideoStream: React.FC<VideoStreamProps> = ({ wsUrl, onZoneDrawn, isDrawing
     };
   }, [wsUrl, isMaximized]);
 
-  const drawFrame = (base64Data: string) => {
+  const drawFrame = (src: string) => {
     const canvas = canvasRef.current;
     if (!canvas) return;
 
@@ -97,27 +123,35 @@ const VideoStream: React.FC<VideoStreamProps> = ({ wsUrl, onZoneDrawn, isDrawing
     if (!ctx) return;
 
     const img = new Image();
+    const release = () => {
+      if (src.startsWith('blob:')) {
+        URL.revokeObjectURL(src);
+      }
+    };
     img.onload = () => {
+      release();
       canvas.width = img.width;
       canvas.height = img.height;
       ctx.drawImage(img, 0, 0);
       
       // Draw current drawing points with enhanced visuals
       if (isDrawingMode && drawingPoints.length > 0) {
+        const source = sourceSizeRef.current;
+        const points = drawingPoints.map(point => scalePoint(point, source ? img.width / source[0] : 1));
         // Draw connecting lines
         ctx.strokeStyle = '#00ff00';
         ctx.lineWidth = 2;
         ctx.setLineDash([5, 5]); // Dashed line
         ctx.beginPath();
-        ctx.moveTo(drawingPoints[0][0], drawingPoints[0][1]);
-        for (let i = 1; i < drawingPoints.length; i++) {
-          ctx.lineTo(drawingPoints[i][0], drawingPoints[i][1]);
+        ctx.moveTo(points[0][0], points[0][1]);
+        for (let i = 1; i < points.length; i++) {
+          ctx.lineTo(points[i][0], points[i][1]);
         }
         ctx.stroke();
         ctx.setLineDash([]); // Reset to solid line
         
         // Draw points with numbers
-        drawingPoints.forEach((point, index) => {
+        points.forEach((point, index) => {
           // Draw point circle
           ctx.fillStyle = '#00ff00';
           ctx.beginPath();
@@ -140,22 +174,23 @@ const VideoStream: React.FC<VideoStreamProps> = ({ wsUrl, onZoneDrawn, isDrawing
         });
         
         // Draw preview line to show where next point would connect
-        if (drawingPoints.length >= 3) {
+        if (points.length >= 3) {
           ctx.strokeStyle = '#ffff00';
           ctx.lineWidth = 1;
           ctx.setLineDash([3, 3]);
           ctx.beginPath();
-          ctx.moveTo(drawingPoints[drawingPoints.length - 1][0], drawingPoints[drawingPoints.length - 1][1]);
-          ctx.lineTo(drawingPoints[0][0], drawingPoints[0][1]);
+          ctx.moveTo(points[points.length - 1][0], points[points.length - 1][1]);
+          ctx.lineTo(points[0][0], points[0][1]);
           ctx.stroke();
           ctx.setLineDash([]);
         }
       }
     };
     img.onerror = (error) => {
+      release();
       console.error('Error loading frame image:', error);
     };
-    img.src = `data:image/jpeg;base64,${base64Data}`;
+    img.src = src;
   };
 
   const handleCanvasClick = (event: React.MouseEvent<HTMLCanvasElement>) => {
@@ -176,10 +211,13 @@ const VideoStream: React.FC<VideoStreamProps> = ({ wsUrl, onZoneDrawn, isDrawing
     const clickX = (event.clientX - rect.left) * (actualWidth / displayWidth);
     const clickY = (event.clientY - rect.top) * (actualHeight / displayHeight);
     
-    const newPoints: [number, number][] = [...drawingPoints, [Math.round(clickX), Math.round(clickY)]];
+    // The backend stores zones in source-frame pixels, whatever tier the canvas shows
+    const source = sourceSizeRef.current;
+    const point = scalePoint([clickX, clickY], source ? source[0] / actualWidth : 1);
+    const newPoints: [number, number][] = [...drawingPoints, point];
     setDrawingPoints(newPoints);
     
-    console.log(`Added point: (${Math.round(clickX)}, ${Math.round(clickY)}) - Canvas: ${actualWidth}x${actualHeight}, Display: ${displayWidth}x${displayHeight}`);
+    console.log(`Added point: (${point[0]}, ${point[1]}) - Canvas: ${actualWidth}x${actualHeight}, Display: ${displayWidth}x${displayHeight}, Source: ${source ? source.join('x') : 'unknown'}`);
     
     // If we have at least 3 points and user double-clicks, finish the zone
     if (newPoints.length >= 3 && event.detail === 2) {
@@ -25,6 +25,6 @@ fi
 
 # Start backend
 echo "🔧 Starting backend server on port 8002..."
-python backend/main.py
+python -m backend.main
 
 echo "🛑 Backend stopped."
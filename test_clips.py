@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import time
+
+import cv2
+import numpy as np
+
+from backend.clips import ClipBuffer, ClipFrame, mjpeg_avi
+from backend.detection_pipeline import DetectionPipeline
+from backend.detections import Detections
+from backend.evidence import EvidenceWriter
+from backend.workers import CapturedFrame
+
+
+def test_mjpeg_avi_reads_back_with_opencv(tmp_path):
+    width, height, count = 160, 120, 12
+    frames = []
+    for index in range(count):
+        image = np.zeros((height, width, 3), np.uint8)
+        cv2.rectangle(image, (index * 10, 20), (index * 10 + 30, 80), (0, 255, 0), -1)
+        ok, jpeg = cv2.imencode('.jpg', image)
+        assert ok
+        frames.append(ClipFrame(100.0 + index / 10, jpeg.tobytes(), width, height))
+
+    path = tmp_path / "clip.avi"
+    path.write_bytes(mjpeg_avi(frames))
+
+    capture = cv2.VideoCapture(str(path))
+    try:
+        assert capture.isOpened()
+        assert round(capture.get(cv2.CAP_PROP_FPS)) == 10
+        decoded = []
+        while True:
+            ok, image = capture.read()
+            if not ok:
+                break
+            decoded.append(image)
+    finally:
+        capture.release()
+
+    assert len(decoded) == count
+    assert decoded[0].shape == (height, width, 3)
+    # The green box moves right frame by frame, so frames came back in order
+    positions = [int(np.flatnonzero(image[50, :, 1] > 128)[0]) for image in decoded]
+    assert positions == sorted(positions) and positions[0] < positions[-1]
+
+
+def jpeg_frame(width=160, height=120):
+    ok, jpeg = cv2.imencode('.jpg', np.zeros((height, width, 3), np.uint8))
+    assert ok
+    return jpeg.tobytes()
+
+
+def test_clip_buffer_only_wants_frames_while_recording(tmp_path):
+    writer = EvidenceWriter(str(tmp_path))
+    clips = ClipBuffer(str(tmp_path), post_seconds=1.0)
+    assert clips.enabled and not clips.wants_frames  # no pre-event ring by default
+
+    path = clips.trigger(100.0, 'zone_intrusion', writer)
+    assert clips.wants_frames
+    for index in range(12):
+        clips.add(100.0 + index / 10, jpeg_frame(), 160, 120)
+    assert not clips.wants_frames
+    writer.close()
+
+    capture = cv2.VideoCapture(path)
+    try:
+        assert capture.get(cv2.CAP_PROP_FRAME_COUNT) == 11
+    finally:
+        capture.release()
+
+
+def test_idle_camera_is_not_drawn_until_a_clip_records(tmp_path):
+    pipeline = DetectionPipeline(rtsp_url=None, photos_dir=str(tmp_path / "photos"), detector=object())
+    camera = pipeline.cameras.add("idle", str(tmp_path / "offline.mp4"))
+    try:
+        frame = np.zeros((120, 160, 3), np.uint8)
+        pipeline.render_frame(camera, CapturedFrame(1, True, frame, time.time()), Detections.empty(), fresh=True)
+        assert camera.latest[2] is False  # nothing drawn or encoded for nobody
+
+        camera.clips.trigger(time.time(), 'zone_intrusion', pipeline.evidence)
+        pipeline.render_frame(camera, CapturedFrame(2, True, frame, time.time()), Detections.empty(), fresh=True)
+        assert camera.latest[2] is True
+        assert camera.clips.stats()['clip_buffer_frames'] == 1
+    finally:
+        pipeline.cameras.close_all()
+        pipeline.evidence.close()
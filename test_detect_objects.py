@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+import time
+
+import numpy as np
+
+from backend.detection_pipeline import DetectionPipeline
+from backend.detectors import Detector
+from backend.workers import CapturedFrame
+
+WIDTH, HEIGHT = 320, 240
+
+
+class BrightBoxDetector(Detector):
+    """One 'person' box around the frame's non-black pixels"""
+
+    backend = "stub"
+
+    def __init__(self):
+        super().__init__()
+        self.names = {0: 'person'}
+
+    def detect(self, frames):
+        output = []
+        for frame in frames:
+            ys, xs = np.nonzero(frame.any(axis=2))
+            boxes = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]], np.float32)
+            output.append((boxes, np.ones(1, np.float32), np.zeros(1, np.int64)))
+        return output
+
+
+def scene(x):
+    frame = np.zeros((HEIGHT, WIDTH, 3), np.uint8)
+    frame[60:200, x:x + 40] = 255
+    return frame
+
+
+def test_detect_objects_does_not_disturb_a_running_camera(tmp_path):
+    pipeline = DetectionPipeline(rtsp_url=None, photos_dir=str(tmp_path / "photos"), detector=BrightBoxDetector())
+    camera = pipeline.cameras.add("live", str(tmp_path / "offline.mp4"))
+    live_ids = []
+    errors = []
+
+    def feed():
+        # What the inference thread does for the camera: one person walking slowly to the right
+        try:
+            for seq in range(300):
+                pipeline.process_frames([(camera, CapturedFrame(seq, True, scene(20 + seq // 3), time.time()))])
+                live_ids.extend(camera.last_detections.track_ids.tolist())
+        except Exception as e:
+            errors.append(e)
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    try:
+        # One-off calls for the same camera id with people jumping around the frame
+        adhoc_ids = set()
+        while feeder.is_alive():
+            for x in (240, 10, 150):
+                _, detections = pipeline.detect_objects(scene(x), camera_id="live")
+                adhoc_ids.update(detection['track_id'] for detection in detections)
+    finally:
+        feeder.join()
+        pipeline.cameras.close_all()
+        pipeline.evidence.close()
+
+    assert not errors
+    assert len(live_ids) == 300 and set(live_ids) == {1}  # the walking person kept its track
+    assert len(camera.tracker) == 1
+    assert adhoc_ids and len(pipeline.tracker) >= 1
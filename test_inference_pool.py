@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+
+import numpy as np
+import pytest
+
+from backend import inference_pool
+from backend.detection_pipeline import DetectionPipeline
+from backend.detectors import Detector
+from backend.inference_pool import TASKS_PER_WORKER, InferencePool, SharedMemoryTooSmall
+
+WIDTH, HEIGHT = 160, 120
+
+
+class EdgeDetector(Detector):
+    """One box per frame spanning its non-black columns; module level so spawned workers can build it"""
+
+    backend = "stub"
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.names = {0: 'person'}
+
+    def detect(self, frames):
+        output = []
+        for frame in frames:
+            columns = np.flatnonzero(frame.any(axis=(0, 2)))
+            boxes = np.array([[columns[0], 0, columns[-1] + 1, frame.shape[0]]], np.float32)
+            output.append((boxes, np.ones(1, np.float32), np.zeros(1, np.int64)))
+        return output
+
+
+def scene(x):
+    """A frame with one object whose left edge is at `x`"""
+    frame = np.zeros((HEIGHT, WIDTH, 3), np.uint8)
+    frame[20:80, x:x + 20] = 255
+    return frame
+
+
+@pytest.fixture
+def results():
+    delivered = []
+    done = threading.Event()
+
+    def on_result(context, output, seconds):
+        delivered.append((context, output))
+        if context == 'last':
+            done.set()
+
+    on_result.delivered = delivered
+    on_result.done = done
+    return on_result
+
+
+def test_results_arrive_in_submission_order_and_regions_are_reused(results):
+    pool = InferencePool(2, EdgeDetector, max_batch=3, frame_bytes=WIDTH * HEIGHT * 3, on_result=results)
+    pool.start()
+    try:
+        batches = 5 * pool.regions  # every region is taken several times over
+        for index in range(batches):
+            frames = [scene(index % 100 + offset) for offset in range(3)]
+            pool.submit(frames, 'last' if index == batches - 1 else index)
+        assert results.done.wait(30)
+
+        contexts = [context for context, _ in results.delivered]
+        assert contexts == list(range(batches - 1)) + ['last']
+        for index, (_, output) in enumerate(results.delivered):
+            lefts = [int(boxes[0][0]) for boxes, _, _ in output]
+            assert lefts == [index % 100 + offset for offset in range(3)]
+
+        stats = pool.stats()
+        assert stats['shared_regions'] == 2 * TASKS_PER_WORKER
+        assert stats['free_regions'] == stats['shared_regions']
+        assert stats['pickled_frames'] == 0
+        assert stats['failed'] == 0
+    finally:
+        pool.close()
+
+
+def test_oversized_frames_and_empty_batches_keep_their_turn(results):
+    pool = InferencePool(1, EdgeDetector, max_batch=1, frame_bytes=WIDTH * HEIGHT * 3, on_result=results)
+    pool.start()
+    try:
+        pool.submit([scene(10), scene(30)], 0)  # the second frame does not fit the region
+        pool.submit([], 1)
+        pool.submit([scene(50)], 'last')
+        assert results.done.wait(30)
+
+        assert [context for context, _ in results.delivered] == [0, 1, 'last']
+        assert [int(boxes[0][0]) for boxes, _, _ in results.delivered[0][1]] == [10, 30]
+        assert results.delivered[1][1] == []
+        assert pool.stats()['pickled_frames'] == 1
+    finally:
+        pool.close()
+
+
+def test_start_refuses_a_segment_larger_than_dev_shm(monkeypatch):
+    monkeypatch.setattr(inference_pool, 'shm_free_bytes', lambda: 64 * 2 ** 20)
+    pool = InferencePool(4, EdgeDetector)
+    with pytest.raises(SharedMemoryTooSmall):
+        pool.start()
+    assert pool.stats()['alive'] == 0
+
+
+def test_pipeline_falls_back_to_in_process_inference(monkeypatch, tmp_path):
+    monkeypatch.setattr(inference_pool, 'shm_free_bytes', lambda: 0)
+    pipeline = DetectionPipeline(rtsp_url=None, photos_dir=str(tmp_path / "photos"), inference_workers=2,
+                                 detector_factory=EdgeDetector)
+    pipeline.start()
+    try:
+        assert isinstance(pipeline.detector, EdgeDetector)
+        _, detections = pipeline.detect_objects(scene(40))
+        assert len(detections) == 1
+    finally:
+        pipeline.stop()
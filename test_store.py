@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import time
+
+from backend.store import EventStore
+
+
+def wait_for_writes(store, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while store.written < count and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert store.written >= count
+
+
+def test_alert_pages_walk_equal_timestamps_without_gaps(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"), flush_interval=0.05)
+    store.open()
+    try:
+        # Several alerts share each timestamp, so the cursor must break ties on the row id
+        now = time.time()  # inside the retention window
+        timestamps = [now] * 5 + [now - 0.5] * 4 + [now - 1.0] * 3
+        for seq, timestamp in enumerate(timestamps, 1):
+            store.add_alert({'seq': seq, 'type': 'zone_intrusion', 'camera_id': 'cam', 'timestamp': timestamp,
+                             'message': f"alert {seq}"})
+        wait_for_writes(store, len(timestamps))
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = store.alerts(cursor=cursor, limit=4)
+            seen += rows
+            if cursor is None:
+                break
+        assert sorted(row['seq'] for row in seen) == list(range(1, len(timestamps) + 1))
+        keys = [(row['timestamp'], row['id']) for row in seen]
+        assert keys == sorted(keys, reverse=True)
+    finally:
+        store.close()
+
+
+def test_lost_evidence_is_unlinked_from_alerts(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"), flush_interval=0.05)
+    store.open()
+    try:
+        store.add_alert({'seq': 1, 'type': 'chair_moved', 'camera_id': 'cam', 'timestamp': time.time(),
+                         'message': "chair moved", 'clip_path': "clips/a.avi", 'photo_path': "photos/a.jpg"})
+        store.forget_evidence('clip', "clips/a.avi")
+        wait_for_writes(store, 2)
+        (row,), _ = store.alerts()
+        assert row['clip_path'] is None
+        assert row['photo_path'] == "photos/a.jpg"
+    finally:
+        store.close()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from backend.tracker import Tracker
+
+PERSON, CHAIR = 0, 56
+
+
+def track_ids(tracker, boxes, class_ids):
+    slots = tracker.update(np.array(boxes, np.float32).reshape(-1, 4), np.array(class_ids, np.int64))
+    return tracker.ids[slots].tolist()
+
+
+def test_ids_follow_boxes_when_detection_order_changes():
+    tracker = Tracker()
+    left, right = [10, 10, 60, 110], [200, 10, 250, 110]
+    first = track_ids(tracker, [left, right], [PERSON, PERSON])
+    # Same objects, nudged and reported in the opposite order
+    second = track_ids(tracker, [[205, 12, 255, 112], [12, 12, 62, 112]], [PERSON, PERSON])
+    assert second == first[::-1]
+    assert len(tracker) == 2
+
+
+def test_ids_are_not_shared_across_classes():
+    tracker = Tracker()
+    box = [10, 10, 60, 110]
+    person, = track_ids(tracker, [box], [PERSON])
+    chair, = track_ids(tracker, [box], [CHAIR])
+    assert chair != person
+
+
+def test_track_coasts_then_expires():
+    tracker = Tracker(max_age=3)
+    box = [10, 10, 60, 110]
+    first, = track_ids(tracker, [box], [PERSON])
+    for _ in range(3):
+        track_ids(tracker, [], [])
+    assert len(tracker) == 1
+    assert track_ids(tracker, [box], [PERSON]) == [first]  # missed frames within max_age keep the ID
+
+    for _ in range(4):
+        track_ids(tracker, [], [])
+    assert len(tracker) == 0
+    assert track_ids(tracker, [box], [PERSON]) != [first]
+
+
+def test_capacity_grows_and_keeps_existing_tracks():
+    tracker = Tracker(capacity=2)
+    boxes = [[x, 0, x + 20, 40] for x in range(0, 400, 40)]
+    first = track_ids(tracker, boxes, [PERSON] * len(boxes))
+    assert track_ids(tracker, boxes, [PERSON] * len(boxes)) == first
+    assert len(set(first)) == len(boxes)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import importlib
+import json
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.broadcast import FRAME_HEADER, QUALITY_TIERS, EncodedFrame
+
+SOURCE_WIDTH, SOURCE_HEIGHT = 1280, 720
+BOX = (640, 360, 960, 600)  # x1, y1, x2, y2 of the object the zone is drawn around, in source pixels
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """The API app with its photo/clip/database paths under tmp_path and one camera registered"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("RTSP_URL", "")
+    main = importlib.reload(importlib.import_module("backend.main"))
+    main.cameras.add("tiered", str(tmp_path / "offline.mp4"))
+    try:
+        yield main
+    finally:
+        main.cameras.close_all()
+
+
+def test_zone_drawn_on_a_downscaled_tier_lands_on_source_pixels(server):
+    frame = np.zeros((SOURCE_HEIGHT, SOURCE_WIDTH, 3), np.uint8)
+    cv2.rectangle(frame, BOX[:2], (BOX[2] - 1, BOX[3] - 1), (255, 255, 255), -1)
+    tier = QUALITY_TIERS[-1]
+    message = EncodedFrame(frame, {'seq': 1}).binary(tier)
+
+    # What a client sees: the header, and a JPEG at the tier's width
+    header = FRAME_HEADER.unpack_from(message)
+    source_width, source_height = header[-2:]
+    assert (source_width, source_height) == (SOURCE_WIDTH, SOURCE_HEIGHT)
+    image = cv2.imdecode(np.frombuffer(message[FRAME_HEADER.size:], np.uint8), cv2.IMREAD_GRAYSCALE)
+    assert image.shape[1] == tier[0]
+
+    # Click the corners of the box on the canvas and scale them as VideoStream.tsx does
+    ys, xs = np.nonzero(image > 128)
+    clicks = [(xs.min(), ys.min()), (xs.max(), ys.min()), (xs.max(), ys.max()), (xs.min(), ys.max())]
+    scale = source_width / image.shape[1]
+    points = [[round(x * scale), round(y * scale)] for x, y in clicks]
+
+    client = TestClient(server.app)
+    response = client.post("/api/zones", json={'id': 'door', 'camera_id': 'tiered', 'points': points})
+    assert response.json()['status'] == 'success'
+
+    zones = server.cameras.get('tiered').zones
+    inside = [((BOX[0] + BOX[2]) // 2, (BOX[1] + BOX[3]) // 2), (BOX[0] + 8, BOX[1] + 8), (BOX[2] - 8, BOX[3] - 8)]
+    outside = [(BOX[0] - 20, BOX[1] - 20), (BOX[2] + 20, BOX[3] + 20), (100, 100)]
+    labels = zones.lookup(np.array(inside + outside), frame.shape)
+    assert list(labels) == ['door'] * len(inside) + [None] * len(outside)
+
+
+def test_json_frames_carry_the_source_size():
+    frame = np.zeros((SOURCE_HEIGHT, SOURCE_WIDTH, 3), np.uint8)
+    message = json.loads(EncodedFrame(frame, {'seq': 1}).json_text(QUALITY_TIERS[-1]))
+    assert (message['source_width'], message['source_height']) == (SOURCE_WIDTH, SOURCE_HEIGHT)